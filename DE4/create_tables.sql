@@ -253,6 +253,7 @@ CREATE INDEX idx_user_sessions_token ON user_sessions(session_token);
 CREATE INDEX idx_user_sessions_user_status ON user_sessions(user_id, status);
 CREATE INDEX idx_user_sessions_expiry ON user_sessions(expires_at);
 CREATE INDEX idx_user_sessions_last_activity ON user_sessions(last_activity);
+CREATE INDEX idx_user_sessions_status_activity ON user_sessions(status, last_activity DESC);
 
 -- Master form indexes
 CREATE INDEX idx_master_forms_form_id ON master_forms(form_id);
@@ -267,6 +268,7 @@ CREATE INDEX idx_form_versions_master_form ON form_versions(master_form_id);
 CREATE INDEX idx_form_versions_current ON form_versions(master_form_id, is_current);
 CREATE INDEX idx_form_versions_published ON form_versions(is_published);
 CREATE INDEX idx_form_versions_created_at ON form_versions(created_at);
+CREATE INDEX idx_form_versions_creator_latest ON form_versions(master_form_id, created_by, created_at DESC);
 
 -- Customization request indexes
 CREATE INDEX idx_customization_requests_request_id ON customization_requests(request_id);
@@ -282,7 +284,7 @@ CREATE INDEX idx_form_operations_operation_id ON form_operations(operation_id);
 CREATE INDEX idx_form_operations_type ON form_operations(operation_type);
 CREATE INDEX idx_form_operations_user ON form_operations(user_id);
 CREATE INDEX idx_form_operations_target ON form_operations(target_type, target_id);
-CREATE INDEX idx_form_operations_timestamp ON form_operations(started_at);
+CREATE INDEX idx_form_operations_timestamp ON form_operations(started_at DESC);
 CREATE INDEX idx_form_operations_success ON form_operations(success);
 CREATE INDEX idx_form_operations_master_form ON form_operations(master_form_id);
 CREATE INDEX idx_form_operations_request ON form_operations(customization_request_id);
@@ -3,18 +3,70 @@ DE4 Database Connection and Dependencies
 FastAPI database integration and session management
 """
 
-from typing import Generator, Optional
+from typing import Generator, NamedTuple, Optional
 from fastapi import Depends, HTTPException, status, Header
+from sqlalchemy import event, select
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
+from cachetools import TTLCache
 from database_manager import get_db_manager, get_user_manager, get_form_manager, get_operation_logger
-from database_schema import User, UserSession, SessionStatus
+from database_schema import User, UserSession, SessionStatus, UserFormSession, FormWorkStatus, UserRole
 import logging
+import os
+import threading
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 # Global database manager instance
 db_manager = get_db_manager()
 
+class SessionUser(NamedTuple):
+    """Immutable snapshot of the authenticated user, safe to share across request threads"""
+    id: int
+    username: str
+    role: UserRole
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "SessionUser":
+        return cls(user.id, user.username, user.role, user.is_active)
+
+# Session token -> (SessionUser, session expires_at) cache, so authenticated requests skip the
+# UserSession/User round-trip. Entries are primed on login, dropped on logout, role changes and
+# deactivation, and never outlive the session they were read from. Invalidation only reaches
+# this process: with several workers, another worker may keep honouring a logged-out token or
+# an old role for up to SESSION_CACHE_TTL_SEC, so keep it short there (0 disables the cache).
+SESSION_CACHE_TTL_SEC = int(os.getenv("SESSION_CACHE_TTL_SEC", "60"))
+_session_user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=max(SESSION_CACHE_TTL_SEC, 1))
+_session_user_cache_lock = threading.RLock()
+
+def cache_session_user(session_token: str, user: User, expires_at: datetime) -> SessionUser:
+    """Remember the user behind a freshly validated or created session token"""
+    snapshot = SessionUser.from_user(user)
+    if SESSION_CACHE_TTL_SEC > 0:
+        with _session_user_cache_lock:
+            _session_user_cache[session_token] = (snapshot, expires_at)
+    return snapshot
+
+def invalidate_session_cache(session_token: str) -> None:
+    """Drop a cached session token (e.g. after logout)"""
+    with _session_user_cache_lock:
+        _session_user_cache.pop(session_token, None)
+
+def invalidate_user_sessions_cache(user_id: int) -> None:
+    """Drop every cached session token belonging to a user (e.g. after a role change)"""
+    with _session_user_cache_lock:
+        stale = [token for token, (user, _) in _session_user_cache.items() if user.id == user_id]
+        for token in stale:
+            _session_user_cache.pop(token, None)
+
+@event.listens_for(User.is_active, "set")
+def _drop_deactivated_user_sessions(target: User, value: bool, oldvalue, initiator) -> None:
+    """Deactivating a user through the ORM revokes their cached sessions immediately"""
+    if not value and target.id is not None:
+        invalidate_user_sessions_cache(target.id)
+
 def get_database_session() -> Generator[Session, None, None]:
     """FastAPI dependency for database sessions"""
     session = db_manager.config.SessionLocal()
@@ -32,7 +84,7 @@ def get_current_user(
     authorization: Optional[str] = Header(None),
     x_session_token: Optional[str] = Header(None, alias="X-Session-Token"),
     db: Session = Depends(get_database_session)
-) -> User:
+) -> SessionUser:
     """FastAPI dependency to get current authenticated user"""
     # Prefer explicit session_token param, then X-Session-Token header, then Authorization: Bearer <token>
     token_to_validate: Optional[str] = session_token or x_session_token
@@ -51,18 +103,29 @@ def get_current_user(
             detail="Session token required"
         )
     
+    with _session_user_cache_lock:
+        cached = _session_user_cache.get(token_to_validate)
+    if cached is not None:
+        cached_user, expires_at = cached
+        if expires_at > datetime.utcnow():
+            return cached_user
+        invalidate_session_cache(token_to_validate)
+    
     try:
         user_manager = get_user_manager()
-        user = user_manager.validate_session(token_to_validate)
+        validated = user_manager.get_session_user(token_to_validate)
         
-        if not user:
+        if not validated:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or expired session"
             )
         
-        return user
+        user, expires_at = validated
+        return cache_session_user(token_to_validate, user, expires_at)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"User authentication failed: {str(e)}")
         raise HTTPException(
@@ -71,8 +134,8 @@ def get_current_user(
         )
 
 def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: SessionUser = Depends(get_current_user)
+) -> SessionUser:
     """FastAPI dependency to get current active user"""
     if not current_user.is_active:
         raise HTTPException(
@@ -82,11 +145,9 @@ def get_current_active_user(
     return current_user
 
 def get_admin_user(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: SessionUser = Depends(get_current_active_user)
+) -> SessionUser:
     """FastAPI dependency to ensure admin privileges"""
-    from database_schema import UserRole
-    
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -94,19 +155,52 @@ def get_admin_user(
         )
     return current_user
 
+_EDITOR_ROLE_VALUES = frozenset({UserRole.EDITOR.value, UserRole.MANAGER.value, UserRole.ADMIN.value})
+
 def require_editor_user(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: SessionUser = Depends(get_current_active_user)
+) -> SessionUser:
     """Require role editor/manager/admin"""
-    from database_schema import UserRole as UR
     role_value = current_user.role.value if hasattr(current_user.role, 'value') else current_user.role
-    if role_value not in {UR.EDITOR.value, UR.MANAGER.value, UR.ADMIN.value}:
+    if role_value not in _EDITOR_ROLE_VALUES:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Editor or higher privileges required"
         )
     return current_user
 
+def get_active_form_session(
+    current_user: SessionUser = Depends(get_current_active_user),
+    db: Session = Depends(get_database_session)
+) -> Optional[UserFormSession]:
+    """FastAPI dependency for the current user's most recent active form session (or None)
+
+    FastAPI caches dependency results per request, so handlers and sub-dependencies
+    asking for it share a single query.
+    """
+    return (
+        db.query(UserFormSession)
+        .filter(UserFormSession.user_id == current_user.id, UserFormSession.status == FormWorkStatus.ACTIVE.value)
+        .order_by(UserFormSession.created_at.desc())
+        .first()
+    )
+
+def get_active_form_session_paths(
+    current_user: SessionUser = Depends(get_current_active_user),
+    db: Session = Depends(get_database_session)
+) -> Optional[Row]:
+    """Read-only variant of get_active_form_session for handlers that only check the file paths
+
+    Returns an (id, original_file_path, modified_file_path) row instead of a hydrated
+    UserFormSession, so no JSON columns are loaded and nothing enters the identity map.
+    """
+    return db.execute(
+        select(UserFormSession.id, UserFormSession.original_file_path, UserFormSession.modified_file_path)
+        .where(UserFormSession.user_id == current_user.id, UserFormSession.status == FormWorkStatus.ACTIVE.value)
+        .order_by(UserFormSession.created_at.desc())
+        .limit(1)
+    ).first()
+
 # Initialize database on module load
 def initialize_database():
     """Initialize database with tables and default data"""
@@ -124,10 +218,16 @@ def initialize_database():
 # Export dependencies and utilities
 __all__ = [
     'get_database_session',
+    'SessionUser',
     'get_current_user', 
     'get_current_active_user',
     'get_admin_user',
     'require_editor_user',
+    'get_active_form_session',
+    'get_active_form_session_paths',
     'initialize_database',
+    'cache_session_user',
+    'invalidate_session_cache',
+    'invalidate_user_sessions_cache',
     'db_manager'
 ]
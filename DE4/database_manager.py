@@ -5,14 +5,21 @@ Database initialization, connection management, and utilities
 
 import os
 from dotenv import load_dotenv
+import atexit
 import logging
-from typing import Generator, Optional, Dict, Any, List
+import logging.handlers
+from typing import Generator, Optional, Dict, Any, List, Tuple
 from contextlib import contextmanager
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from functools import lru_cache
+from sqlalchemy import bindparam, exists, insert, select
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from datetime import datetime, timedelta
 import hashlib
 import json
+import queue
+import threading
+import time
 from urllib.parse import urlparse, urlunparse
 
 from database_schema import (
@@ -20,16 +27,40 @@ from database_schema import (
     User, UserSession, MasterForm, FormVersion,
     CustomizationRequest, FormOperation,
     UserRole, RequestStatus, OperationType, SessionStatus,
-    generate_uuid, get_database_stats
+    generate_uuid, get_database_stats, compress_xml
 )
 
+# Load environment variables from .env if present (so DATABASE_URL/OPENAI_API_KEY/LOG_LEVEL are available)
+load_dotenv()
+
+def _configure_logging():
+    """Route root logging through a queue so callers never block on stream/file writes
+
+    Records are formatted and written by a QueueListener thread. Does nothing if the host
+    (uvicorn --log-config, tests) has already configured the root logger.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    log_file = os.getenv("LOG_FILE")
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    formatter = logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+_configure_logging()
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env if present (so DATABASE_URL/OPENAI_API_KEY are available)
-load_dotenv()
-
 class DatabaseManager:
     """Central database manager for DE4 platform"""
     
@@ -129,8 +160,7 @@ class DatabaseManager:
         """Check database health and return status"""
         try:
             with self.get_session() as session:
-                # Test basic query
-                user_count = session.query(User).count()
+                # get_database_stats doubles as the connectivity probe
                 stats = get_database_stats(session)
                 
                 return {
@@ -149,6 +179,18 @@ class DatabaseManager:
                 "timestamp": datetime.utcnow().isoformat()
             }
     
+    def pool_stats(self) -> Dict[str, int]:
+        """Connection pool occupancy (empty for pools that don't track it)"""
+        pool = self.config.engine.pool
+        if not hasattr(pool, "checkedout"):
+            return {}
+        return {
+            "pool_size": pool.size(),
+            "pool_checked_out": pool.checkedout(),
+            "pool_checked_in": pool.checkedin(),
+            "pool_overflow": pool.overflow(),
+        }
+    
     def cleanup_expired_sessions(self) -> int:
         """Clean up expired user sessions"""
         try:
@@ -229,7 +271,11 @@ class DatabaseManager:
             "database_url_masked": self._masked_url(self.config.database_url),
             "echo_sql": os.getenv("SQLALCHEMY_ECHO", "false"),
             "sslmode": os.getenv("DB_SSLMODE", "require"),
-            "pool_recycle_sec": os.getenv("DB_POOL_RECYCLE_SEC", "3600"),
+            "pool_recycle_sec": os.getenv("DB_POOL_RECYCLE_SEC", "1800"),
+            "pool_size": os.getenv("DB_POOL_SIZE", "20"),
+            "max_overflow": os.getenv("DB_MAX_OVERFLOW", "40"),
+            "pool_timeout_sec": os.getenv("DB_POOL_TIMEOUT_SEC", "30"),
+            "statement_timeout_ms": os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"),
         }
     
     def backup_database(self, backup_path: str) -> bool:
@@ -277,6 +323,19 @@ class DatabaseManager:
             logger.error(f"Database backup failed: {str(e)}")
             return False
 
+# Built once so token validation (every uncached authenticated request) reuses one statement
+# object and its compiled SQL instead of assembling a new query each time
+_SESSION_USER_BY_TOKEN = (
+    select(UserSession)
+    .options(joinedload(UserSession.user))
+    .where(
+        UserSession.session_token == bindparam("session_token"),
+        UserSession.status == SessionStatus.ACTIVE,
+        UserSession.expires_at > bindparam("now"),
+    )
+    .limit(1)
+)
+
 class UserManager:
     """User management utilities"""
     
@@ -286,18 +345,13 @@ class UserManager:
     def create_user(self, username: str, email: str, password: str, 
                    full_name: str = "", role: UserRole = UserRole.VIEWER,
                    **kwargs) -> Optional[User]:
-        """Create new user"""
+        """Create new user
+        
+        Duplicates are detected by the username/email UNIQUE constraints rather than a
+        pre-check query, so an IntegrityError is raised for an existing user.
+        """
         try:
             with self.db_manager.get_session() as session:
-                # Check if user exists
-                existing = session.query(User).filter(
-                    (User.username == username) | (User.email == email)
-                ).first()
-                
-                if existing:
-                    logger.warning(f"User already exists: {username} or {email}")
-                    return None
-                
                 # Create new user
                 # Normalize role for DB (string value for Postgres enum)
                 normalized_role = role.value if hasattr(role, 'value') else role
@@ -313,11 +367,15 @@ class UserManager:
                 
                 session.add(user)
                 session.commit()
-                session.refresh(user)
+                # No refresh: id comes back from the INSERT and every other column has a
+                # Python-side default, and expire_on_commit=False keeps them loaded
                 
                 logger.info(f"Created user: {username}")
                 return user
                 
+        except IntegrityError:
+            logger.warning(f"User already exists: {username} or {email}")
+            raise
         except Exception as e:
             logger.error(f"User creation failed: {str(e)}")
             return None
@@ -373,19 +431,23 @@ class UserManager:
     
     def validate_session(self, session_token: str) -> Optional[User]:
         """Validate session token and return user"""
+        validated = self.get_session_user(session_token)
+        return validated[0] if validated else None
+    
+    def get_session_user(self, session_token: str) -> Optional[Tuple[User, datetime]]:
+        """Validate session token and return (user, session expires_at)"""
         try:
             with self.db_manager.get_session() as session:
-                user_session = session.query(UserSession).filter(
-                    UserSession.session_token == session_token,
-                    UserSession.status == SessionStatus.ACTIVE,
-                    UserSession.expires_at > datetime.utcnow()
-                ).first()
+                # Loads the user in the same SELECT instead of a lazy load on user_session.user
+                user_session = session.execute(
+                    _SESSION_USER_BY_TOKEN, {"session_token": session_token, "now": datetime.utcnow()}
+                ).scalars().first()
                 
                 if user_session:
                     # Update last activity
                     user_session.last_activity = datetime.utcnow()
                     session.commit()
-                    return user_session.user
+                    return user_session.user, user_session.expires_at
                 
                 return None
                 
@@ -406,11 +468,10 @@ class FormManager:
         """Create new master form with initial version"""
         try:
             with self.db_manager.get_session() as session:
-                # Check if form exists
-                existing = session.query(MasterForm).filter(
-                    MasterForm.name == name,
-                    MasterForm.current_version == version
-                ).first()
+                # Check if form exists (EXISTS probe: nothing but a boolean comes back)
+                existing = session.execute(
+                    select(exists().where(MasterForm.name == name, MasterForm.current_version == version))
+                ).scalar()
                 
                 if existing:
                     logger.warning(f"Master form already exists: {name} v{version}")
@@ -443,7 +504,8 @@ class FormManager:
                 form_version = FormVersion(
                     master_form_id=master_form.id,
                     version=version,
-                    xml_content=xml_content,
+                    xml_content=compress_xml(xml_content) if xml_content else "",
+                    xml_compressed=bool(xml_content),
                     is_current=True,
                     is_published=True,
                     file_size=file_size,
@@ -453,8 +515,8 @@ class FormManager:
                 )
                 
                 session.add(form_version)
+                # expire_on_commit is off, so the returned instance stays loaded without a refresh SELECT
                 session.commit()
-                session.refresh(master_form)
                 
                 logger.info(f"Created master form: {name} v{version}")
                 return master_form
@@ -492,44 +554,137 @@ class FormManager:
             return None
 
 class OperationLogger:
-    """Log all form operations for audit trail"""
+    """Log all form operations for audit trail
+
+    Rows are queued and inserted in batches by a background thread, so request
+    handlers never wait on the audit-log INSERT.
+    """
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, batch_size: int = 500, flush_interval: float = 0.1,
+                 max_queued: int = 10000):
         self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Bounded so a stalled database can't grow the backlog without limit. Callers (async
+        # handlers included) never block on it: when full the row is dropped and counted
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queued)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._dropped = 0
+        self._last_drop_warning = 0.0
     
     def log_operation(self, operation_type: OperationType, description: str,
                      target_type: str, target_id: str = None, target_name: str = None,
                      user_id: int = None, success: bool = True,
                      before_data: Dict = None, after_data: Dict = None,
-                     **kwargs) -> Optional[FormOperation]:
-        """Log form operation"""
+                     **kwargs) -> Optional[str]:
+        """Queue form operation for logging and return its operation_id"""
         try:
-            with self.db_manager.get_session() as session:
-                operation_id = f"op_{generate_uuid()[:8]}"
-                
-                operation = FormOperation(
-                    operation_id=operation_id,
-                    operation_type=operation_type.value,
-                    operation_description=description,
-                    target_type=target_type,
-                    target_id=target_id,
-                    target_name=target_name,
-                    user_id=user_id,
-                    success=success,
-                    before_data=before_data,
-                    after_data=after_data,
-                    completed_at=datetime.utcnow(),
-                    **kwargs
-                )
-                
-                session.add(operation)
-                session.commit()
-                
-                return operation
-                
+            operation_id = f"op_{generate_uuid()[:8]}"
+            now = datetime.utcnow()
+            
+            self._ensure_worker()
+            self._queue.put_nowait({
+                "operation_id": operation_id,
+                "operation_type": operation_type.value,
+                "operation_description": description,
+                "target_type": target_type,
+                "target_id": target_id,
+                "target_name": target_name,
+                "user_id": user_id,
+                "success": success,
+                "before_data": before_data,
+                "after_data": after_data,
+                "started_at": now,
+                "completed_at": now,
+                **kwargs
+            })
+            
+            return operation_id
+        
+        except queue.Full:
+            self._record_drop()
+            return None
         except Exception as e:
             logger.error(f"Operation logging failed: {str(e)}")
             return None
+    
+    def _record_drop(self):
+        # Racy increments under concurrency only skew the reported count, so no lock here
+        self._dropped += 1
+        now = time.monotonic()
+        if now - self._last_drop_warning >= 10.0:
+            self._last_drop_warning = now
+            logger.warning(
+                "Operation log queue full (%d queued); %d audit rows dropped so far",
+                self._queue.maxsize, self._dropped,
+            )
+    
+    def flush(self):
+        """Block until every queued operation has been written"""
+        if self._worker is None:
+            return
+        if self._worker.is_alive():
+            self._queue.join()
+            return
+        # Worker is gone (e.g. interpreter shutdown), so drain what is left on this thread
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            if rows:
+                self._write_batch(rows)
+        finally:
+            for _ in rows:
+                self._queue.task_done()
+    
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="operation-logger", daemon=True)
+                self._worker.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect whatever else arrives within the flush interval, up to batch_size rows
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    def _write_batch(self, rows: List[Dict[str, Any]]):
+        # executemany needs a uniform key set, so group rows that carry extra kwargs separately
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        for group in groups.values():
+            try:
+                with self.db_manager.get_session() as session:
+                    session.execute(insert(FormOperation), group)
+                    session.commit()
+            except Exception as e:
+                if len(group) == 1:
+                    logger.error(f"Operation logging failed: {str(e)}")
+                    continue
+                # Retry row by row so one bad row doesn't drop the rest of the batch
+                for row in group:
+                    self._write_batch([row])
 
 # Global database manager instance
 db_manager = None
@@ -548,18 +703,26 @@ def initialize_database(force_recreate: bool = False) -> bool:
     manager = get_db_manager()
     return manager.initialize_database(force_recreate)
 
-# Convenience functions
+# Convenience functions (managers are stateless wrappers, so build each once and reuse it)
+@lru_cache(maxsize=1)
 def get_user_manager() -> UserManager:
     """Get user manager instance"""
     return UserManager(get_db_manager())
 
+@lru_cache(maxsize=1)
 def get_form_manager() -> FormManager:
     """Get form manager instance"""
     return FormManager(get_db_manager())
 
+@lru_cache(maxsize=1)
 def get_operation_logger() -> OperationLogger:
     """Get operation logger instance"""
-    return OperationLogger(get_db_manager())
+    return OperationLogger(
+        get_db_manager(),
+        batch_size=int(os.getenv("OPERATION_LOG_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("OPERATION_LOG_FLUSH_INTERVAL_SEC", "0.1")),
+        max_queued=int(os.getenv("OPERATION_LOG_QUEUE_MAX", "10000")),
+    )
 
 # Export main components
 __all__ = [
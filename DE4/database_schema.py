@@ -5,16 +5,20 @@ Comprehensive database design for XML Forms Platform
 
 from sqlalchemy import (
     Column, Integer, String, Text, DateTime, Boolean, 
-    ForeignKey, JSON, Enum, Float, Index, UniqueConstraint
+    ForeignKey, JSON, Enum, Float, Index, UniqueConstraint, func, select, text
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.ext.mutable import MutableList
+from sqlalchemy.orm import deferred, relationship, sessionmaker
 from sqlalchemy import create_engine
 import os
+import base64
 from datetime import datetime
 import enum
 import uuid
-from typing import Optional
+from typing import Iterator, Optional
+import orjson
+import zstandard
 
 Base = declarative_base()
 
@@ -142,6 +146,8 @@ class UserSession(Base):
         Index('idx_session_token', 'session_token'),
         Index('idx_user_active_sessions', 'user_id', 'status'),
         Index('idx_session_expiry', 'expires_at'),
+        # Dashboard: active sessions ordered by most recent activity
+        Index('idx_session_status_activity', 'status', 'last_activity'),
     )
     
     def __repr__(self):
@@ -196,6 +202,7 @@ class MasterForm(Base):
         Index('idx_master_form_type', 'form_type'),
         Index('idx_master_form_active', 'is_active'),
         Index('idx_master_form_template', 'is_template'),
+        Index('idx_master_form_created_at', 'created_at'),
     )
     
     def __repr__(self):
@@ -214,8 +221,9 @@ class FormVersion(Base):
     is_current = Column(Boolean, default=False, nullable=False)
     is_published = Column(Boolean, default=False, nullable=False)
     
-    # XML Content - stored as compressed text for large forms
-    xml_content = Column(Text, nullable=False)  # Complete XML content
+    # XML Content - stored as compressed text for large forms; deferred so ORM loads of a
+    # version (e.g. through MasterForm.versions) only fetch it when it is actually read
+    xml_content = deferred(Column(Text, nullable=False))  # Complete XML content
     xml_compressed = Column(Boolean, default=False, nullable=False)
     
     # Form structure metadata (for quick queries without parsing XML)
@@ -244,6 +252,10 @@ class FormVersion(Base):
         UniqueConstraint('master_form_id', 'version', name='uq_form_version'),
         Index('idx_form_version_current', 'master_form_id', 'is_current'),
         Index('idx_form_version_published', 'is_published'),
+        # Export/status: a user's latest version of a form
+        Index('idx_form_version_creator_latest', 'master_form_id', 'created_by', 'created_at'),
+        # Dashboard: newest versions first (ORDER BY created_at DESC LIMIT n) and its MAX(created_at) change marker
+        Index('idx_form_version_created_at', 'created_at'),
     )
     
     def __repr__(self):
@@ -433,12 +445,27 @@ class UserFormSession(Base):
     original_file_path = Column(String(500), nullable=True)
     modified_file_path = Column(String(500), nullable=True)
     analysis_json = Column(JSON, nullable=True)
-    edit_history_json = Column(JSON, nullable=True)
+    # MutableList so in-place append/trim marks the column dirty without rebuilding the list
+    edit_history_json = Column(MutableList.as_mutable(JSON), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     user = relationship("User")
 
+    # Indexes
+    __table_args__ = (
+        Index('idx_user_form_session_updated', 'updated_at'),
+        # Active-session lookup (status, export, reset): partial so only active rows are indexed,
+        # newest created_at first per user
+        Index(
+            'idx_user_form_session_user_active_created',
+            user_id,
+            created_at.desc(),
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+    )
+
     def __repr__(self):
         return f"<UserFormSession(id='{self.id}', user_id={self.user_id}, status='{self.status}')>"
 
@@ -454,7 +481,14 @@ class DatabaseConfig:
 
         # Determine engine options from env
         echo_sql = os.getenv("SQLALCHEMY_ECHO", "false").lower() in ("1", "true", "yes")
-        pool_recycle = int(os.getenv("DB_POOL_RECYCLE_SEC", "3600"))
+        pool_recycle = int(os.getenv("DB_POOL_RECYCLE_SEC", "1800"))
+        # Pool sized for FastAPI's threadpool concurrency (pool_size + max_overflow connections)
+        pool_size = int(os.getenv("DB_POOL_SIZE", "20"))
+        max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+        pool_timeout = int(os.getenv("DB_POOL_TIMEOUT_SEC", "30"))
+        # Compiled-SQL cache entries (SQLAlchemy default 500); sized so every per-request
+        # statement variant stays compiled
+        query_cache_size = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
 
         # SSL options for Supabase/Postgres
         connect_args = {}
@@ -467,6 +501,12 @@ class DatabaseConfig:
             sslrootcert = os.getenv("DB_SSLROOTCERT")
             if sslrootcert:
                 connect_args["sslrootcert"] = sslrootcert
+            # Server-side cap on any single statement, so a runaway query is cancelled instead of
+            # pinning a pooled connection (opt-in: some poolers reject startup options, and it
+            # would also cap schema setup, backups and long exports)
+            statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+            if statement_timeout_ms:
+                connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
 
         if not self.database_url:
             # Create a placeholder engine that will error clearly when used
@@ -480,9 +520,15 @@ class DatabaseConfig:
             self.engine = create_engine(
                 self.database_url,
                 echo=echo_sql,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
                 pool_pre_ping=True,
                 pool_recycle=pool_recycle,
+                query_cache_size=query_cache_size,
                 connect_args=connect_args,
+                json_serializer=_json_dumps,
+                json_deserializer=orjson.loads,
             )
         
         # Create session factory
@@ -515,21 +561,58 @@ def generate_uuid() -> str:
     """Generate a UUID string"""
     return str(uuid.uuid4())
 
-def get_database_stats(session) -> dict:
-    """Get database statistics"""
-    stats = {}
-    
-    # Count records in each table
-    stats['users'] = session.query(User).count()
-    stats['active_sessions'] = session.query(UserSession).filter(UserSession.status == SessionStatus.ACTIVE).count()
-    stats['master_forms'] = session.query(MasterForm).count()
-    stats['active_master_forms'] = session.query(MasterForm).filter(MasterForm.is_active == True).count()
-    stats['form_versions'] = session.query(FormVersion).count()
-    stats['customization_requests'] = session.query(CustomizationRequest).count()
-    stats['pending_requests'] = session.query(CustomizationRequest).filter(CustomizationRequest.status == RequestStatus.PENDING).count()
-    stats['form_operations'] = session.query(FormOperation).count()
-    
-    return stats
+def _json_dumps(value) -> str:
+    """orjson-backed serializer for JSON columns (non-str keys allowed, as with json.dumps)."""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+# zstd level for FormVersion.xml_content; XLSForm XML compresses well even at low levels
+XML_ZSTD_LEVEL = int(os.getenv("XML_ZSTD_LEVEL", "3"))
+
+def compress_xml(xml_content: str) -> str:
+    """zstd-compress XML for FormVersion.xml_content (base64 so it fits the Text column)"""
+    compressed = zstandard.ZstdCompressor(level=XML_ZSTD_LEVEL).compress(xml_content.encode('utf-8'))
+    return base64.b64encode(compressed).decode('ascii')
+
+def decompress_xml(stored: str) -> str:
+    """Inverse of compress_xml"""
+    return zstandard.ZstdDecompressor().decompress(base64.b64decode(stored)).decode('utf-8')
+
+def iter_decompressed_xml(stored: str, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Yield compress_xml output back as UTF-8 XML bytes, one chunk at a time"""
+    with zstandard.ZstdDecompressor().stream_reader(base64.b64decode(stored)) as reader:
+        while chunk := reader.read(chunk_size):
+            yield chunk
+
+def iter_stored_xml(xml_content: str, xml_compressed: bool, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Yield a FormVersion's XML as UTF-8 bytes, chunk by chunk, whether or not it is compressed"""
+    if xml_compressed:
+        yield from iter_decompressed_xml(xml_content, chunk_size)
+        return
+    for start in range(0, len(xml_content), chunk_size):
+        yield xml_content[start:start + chunk_size].encode('utf-8')
+
+def get_database_stats(session, *extra_columns) -> dict:
+    """Get database statistics
+
+    Callers needing further aggregates can pass them as labeled scalar subqueries in
+    `extra_columns`; they are returned under their labels from the same round-trip.
+    """
+    # Count records in each table, all as scalar subqueries of a single SELECT (one round-trip)
+    counts = {
+        'users': select(func.count(User.id)),
+        'active_sessions': select(func.count(UserSession.id)).where(UserSession.status == SessionStatus.ACTIVE),
+        'master_forms': select(func.count(MasterForm.id)),
+        'active_master_forms': select(func.count(MasterForm.id)).where(MasterForm.is_active == True),
+        'form_versions': select(func.count(FormVersion.id)),
+        'customization_requests': select(func.count(CustomizationRequest.id)),
+        'pending_requests': select(func.count(CustomizationRequest.id)).where(CustomizationRequest.status == RequestStatus.PENDING),
+        'form_operations': select(func.count(FormOperation.id)),
+    }
+    row = session.execute(
+        select(*[query.scalar_subquery().label(name) for name, query in counts.items()], *extra_columns)
+    ).one()
+    
+    return dict(row._mapping)
 
 # Export main components
 __all__ = [
@@ -539,5 +622,6 @@ __all__ = [
     'CustomizationRequest', 'FormOperation',
     'DatabaseConfig',
     'UserRole', 'RequestStatus', 'OperationType', 'SessionStatus',
-    'generate_uuid', 'get_database_stats'
+    'generate_uuid', 'get_database_stats',
+    'compress_xml', 'decompress_xml', 'iter_decompressed_xml', 'iter_stored_xml'
 ]
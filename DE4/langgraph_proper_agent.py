@@ -4,10 +4,11 @@ Proper LangGraph ReAct Agent Implementation (2025)
 Based on official LangGraph documentation and patterns
 """
 
+import asyncio
 import json
 import os
 import re
-from typing import Annotated, Sequence, TypedDict
+from typing import Annotated, Optional, Sequence, TypedDict
 
 from dotenv import load_dotenv
 from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage
@@ -18,7 +19,7 @@ from langgraph.graph import END, StateGraph
 from langgraph.graph.message import add_messages
 
 from task_manager import create_task_manager
-from xml_editor import create_xml_editor
+from xml_editor import create_xml_editor, take_saved_xml
 
 load_dotenv()
 
@@ -30,6 +31,23 @@ class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
 
 
+def _reported_modified_file(messages) -> Optional[str]:
+    """Return the most recent XML path a tool reported writing, if any"""
+    for msg in reversed(messages):
+        if not isinstance(msg, ToolMessage):
+            continue
+        try:
+            payload = json.loads(msg.content)
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(payload, dict):
+            continue
+        path = payload.get("modified_file_path") or (payload.get("modified_files") or [None])[-1]
+        if path:
+            return path
+    return None
+
+
 class XLSFormProperAgent:
     """Proper LangGraph agent implementation for XLSForm editing"""
 
@@ -415,6 +433,11 @@ class XLSFormProperAgent:
 
     async def process_prompt(self, user_prompt: str):
         """Process user prompt using the proper LangGraph agent"""
+        # Graph streaming and tool execution are synchronous; keep them off the event loop
+        return await asyncio.to_thread(self.process_prompt_sync, user_prompt)
+
+    def process_prompt_sync(self, user_prompt: str):
+        """Blocking variant of process_prompt for use from worker threads"""
         print(f"🚀 Processing prompt: '{user_prompt}'")
 
         inputs = {"messages": [("user", user_prompt)]}
@@ -435,11 +458,17 @@ class XLSFormProperAgent:
                 if hasattr(msg, "tool_calls") and msg.tool_calls:
                     tool_calls_made += len(msg.tool_calls)
 
+            modified_file_path = _reported_modified_file(result_messages)
+            # Hand back the bytes the tool just wrote so the caller need not re-read the file
+            saved_xml = take_saved_xml(modified_file_path) if modified_file_path else None
+
             return {
                 "success": True,
                 "user_prompt": user_prompt,
                 "agent_response": final_response.strip(),
                 "tool_calls_made": tool_calls_made,
+                "modified_file_path": modified_file_path,
+                "xml_content": saved_xml.decode("utf-8") if saved_xml is not None else None,
                 "messages": result_messages,
             }
 
@@ -1,28 +1,66 @@
+import asyncio
+import hashlib
 import json
+import logging
 import os
+import re
+import shutil
 import tempfile
+import threading
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile, status
+import aiofiles
+import anyio
+import orjson
+from cachetools import TTLCache
+from fastapi import BackgroundTasks, Depends, FastAPI, File, Header, HTTPException, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr, validator
+from sqlalchemy import case, exists, func, insert, select, text, update
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import Session
 
 from database import (
+    SessionUser,
+    cache_session_user,
     db_manager,
+    get_active_form_session,
+    get_active_form_session_paths,
     get_admin_user,
     get_current_active_user,
     get_current_user,
     get_database_session,
     initialize_database,
+    invalidate_session_cache,
+    invalidate_user_sessions_cache,
     require_editor_user,
 )
-from database_manager import get_form_manager, get_operation_logger, get_user_manager
-from database_schema import OperationType, RequestStatus, SessionStatus, User, UserRole
+from database_manager import OperationLogger, UserManager, get_form_manager, get_operation_logger, get_user_manager
+from database_schema import (
+    CustomizationRequest,
+    FormOperation,
+    FormVersion,
+    FormWorkStatus,
+    MasterForm,
+    OperationType,
+    RequestStatus,
+    SessionStatus,
+    User,
+    UserFormSession,
+    UserRole,
+    UserSession,
+    compress_xml,
+    get_database_stats,
+    iter_stored_xml,
+)
 from langgraph_proper_agent import create_proper_xlsform_agent
 from models import (
     Choice,
@@ -41,35 +79,51 @@ from models import (
     XLSFormData,
     XLSFormStats,
 )
-from xml_parser import create_xml_editor
+from xml_parser import choice_worksheets_from_headers, scan_worksheet_headers
 
-app = FastAPI(
-    title="DE4 Forms Platform API",
-    description="AI-powered XLSForm platform with user management and customization",
-    version="2.0.0",
-)
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],  # React dev server
-    allow_credentials=True,
-    allow_methods=["*"],  # Allow all HTTP methods
-    allow_headers=["*"],  # Allow all headers
-)
+logger = logging.getLogger(__name__)
 
+THREADPOOL_MAX_THREADS = int(os.getenv("THREADPOOL_MAX_THREADS", "100"))
 
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database and cleanup on startup"""
-    # Print DB debug summary and connection status at startup
+
+# Connections opened concurrently during warm-up; each one is a TCP + TLS + auth handshake, so
+# opening a remote pool one at a time adds seconds to startup
+DB_POOL_WARM_WORKERS = int(os.getenv("DB_POOL_WARM_WORKERS", "8"))
+
+
+def _open_warm_connection():
+    """Check out a new pooled connection and make sure it answers."""
+    conn = db_manager.config.engine.connect()
     try:
-        from database import db_manager as dm
+        conn.execute(text("SELECT 1"))
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def _warm_connection_pool(count: int) -> None:
+    """Open `count` pooled connections at once, then return them all to the pool."""
+    # Every connection stays checked out until all are open, so each worker really opens a new one
+    with ThreadPoolExecutor(max_workers=max(1, min(count, DB_POOL_WARM_WORKERS))) as executor:
+        futures = [executor.submit(_open_warm_connection) for _ in range(count)]
+    for future in futures:
+        if future.exception() is None:
+            future.result().close()
+    for future in futures:
+        if future.exception() is not None:
+            raise future.exception()
 
-        summary = dm.debug_summary()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize database, warm the connection pool and cleanup on startup"""
+    # Print DB debug summary and connection status at startup
+    try:
+        summary = db_manager.debug_summary()
         print("DB Config:", summary)
-        conn_test = dm.test_connection()
+        conn_test = db_manager.test_connection()
         print("DB Connection Test:", {k: v for k, v in conn_test.items() if k != "database_url"})
     except Exception as e:
         print("DB debug failed:", str(e))
@@ -85,6 +139,43 @@ async def startup_event():
     except Exception as e:
         print(f"Session cleanup error: {e}")
 
+    # Sync endpoints and dependencies run on AnyIO's threadpool (40 threads by default); size it
+    # to the DB pool so requests wait on connections rather than on free threads
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_MAX_THREADS
+
+    # Open pool connections up front so the first requests don't pay connection setup
+    pool = db_manager.config.engine.pool
+    warm_connections = pool.size() if hasattr(pool, "size") else 1
+    try:
+        await asyncio.to_thread(_warm_connection_pool, warm_connections)
+        print(f"DB pool warmed: {pool.status()}")
+    except Exception as e:
+        print(f"DB pool warm-up failed: {e}")
+
+    yield
+
+    _ai_edit_executor.shutdown(wait=False)
+    # Drain queued audit-log rows before the process exits
+    get_operation_logger().flush()
+
+
+app = FastAPI(
+    title="DE4 Forms Platform API",
+    description="AI-powered XLSForm platform with user management and customization",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],  # React dev server
+    allow_credentials=True,
+    allow_methods=["*"],  # Allow all HTTP methods
+    allow_headers=["*"],  # Allow all headers
+)
+
 
 # =============== PYDANTIC MODELS ===============
 
@@ -128,6 +219,14 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+    @validator("role", pre=True)
+    def normalize_role(cls, v):
+        return v.value if hasattr(v, "value") else v
+
+    @validator("full_name", "company", "department", pre=True)
+    def default_empty_string(cls, v):
+        return v or ""
+
 
 class LoginRequest(BaseModel):
     username: str
@@ -179,11 +278,183 @@ current_uploaded_file: Optional[str] = None
 current_modified_file: Optional[str] = None
 edit_history: List[Dict[str, Any]] = []
 
+UPLOAD_CHUNK_SIZE = 1 << 20
+# Uploads are streamed, so an oversized body is rejected as soon as it crosses this limit
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 << 20)))
+
+# Number of most recently updated form sessions scanned for the dashboard's prompt list
+DASHBOARD_PROMPT_SESSION_LIMIT = 200
+
+# Serialized dashboards keyed by their ETag. The tag is built from row counts and latest write
+# times of every table the payload reads, which catches inserts, deletes and stamped updates.
+# Updates that stamp no timestamp column can slip past it, so the tag also carries a time bucket:
+# neither a cached body nor a 304 outlives DASHBOARD_CACHE_TTL_SEC
+DASHBOARD_CACHE_TTL_SEC = int(os.getenv("DASHBOARD_CACHE_TTL_SEC", "30"))
+_dashboard_cache: TTLCache = TTLCache(maxsize=4, ttl=DASHBOARD_CACHE_TTL_SEC)
+
+# The dashboard audits its own reads; those rows are left out of everything it shows (and of
+# its ETag), otherwise every poll would change the next response
+_DASHBOARD_OPERATIONS = FormOperation.target_type != "admin_dashboard"
+
+# Change marker for the dashboard ETag: count + latest write time per table the payload reads
+_DASHBOARD_TAG_COLUMNS = [
+    query.scalar_subquery()
+    for query in (
+        select(func.count(FormOperation.id)).where(_DASHBOARD_OPERATIONS),
+        select(func.max(FormOperation.started_at)).where(_DASHBOARD_OPERATIONS),
+        select(func.count(UserSession.id)),
+        select(func.count(UserSession.id)).where(UserSession.status == SessionStatus.ACTIVE),
+        select(func.max(UserSession.last_activity)),
+        select(func.max(UserSession.terminated_at)),
+        select(func.count(MasterForm.id)),
+        select(func.max(MasterForm.updated_at)),
+        select(func.count(FormVersion.id)),
+        select(func.max(FormVersion.created_at)),
+        select(func.count(FormVersion.id)).where(FormVersion.is_current == True),
+        select(func.count(FormVersion.id)).where(FormVersion.is_published == True),
+        select(func.count(UserFormSession.id)),
+        select(func.max(UserFormSession.updated_at)),
+        select(func.count(CustomizationRequest.id)),
+        select(func.max(CustomizationRequest.updated_at)),
+        select(func.count(User.id)),
+        select(func.max(User.updated_at)),
+    )
+]
+
+# Per-user /api/status bodies (minus the timestamp) for UI polling. Entries are dropped whenever
+# the user's form session changes (upload, AI edit, version save, reset); the TTL bounds how
+# long a write from anywhere else can go unseen
+STATUS_CACHE_TTL_SEC = int(os.getenv("STATUS_CACHE_TTL_SEC", "5"))
+_status_cache: TTLCache = TTLCache(maxsize=10_000, ttl=STATUS_CACHE_TTL_SEC)
+_status_cache_lock = threading.Lock()
+
+
+def _invalidate_status_cache(user_id: int) -> None:
+    """Drop a user's cached /api/status body after their form session changed."""
+    with _status_cache_lock:
+        _status_cache.pop(user_id, None)
+
+
+# Rolling window kept in UserFormSession.edit_history_json; the JSON column is written whole,
+# so an uncapped list makes every write grow with the session's edit count
+EDIT_HISTORY_MAX_ENTRIES = int(os.getenv("EDIT_HISTORY_MAX_ENTRIES", "100"))
+
+# Longest accepted AI-edit prompt; the prompt is copied into the agent context, the edit
+# history, version summaries and audit rows, so larger payloads are rejected up front
+AI_EDIT_MAX_PROMPT_CHARS = int(os.getenv("AI_EDIT_MAX_PROMPT_CHARS", "8000"))
+
+# Agent-response markers, compiled once: phrases meaning an edit landed (case-insensitive), and
+# markers emitted by the task-plan executor when its tasks completed
+_EDIT_SUCCESS_RE = re.compile(
+    "|".join(
+        re.escape(indicator)
+        for indicator in (
+            "successfully added",
+            "added choice option",
+            "modified_file_path",
+            "_modified.xml",
+            "backup_created",
+        )
+    ),
+    re.IGNORECASE,
+)
+_TASKS_COMPLETED_RE = re.compile(
+    r'"status":\s*"completed"|"completed_tasks"|Successfully completed|✅|"execution_completed":\s*true'
+)
+
+# Short-lived cache of completed AI-edit responses so retried/duplicate submissions
+# replay the prior result instead of re-running the agent and re-inserting versions
+AI_EDIT_IDEMPOTENCY_TTL_SEC = int(os.getenv("AI_EDIT_IDEMPOTENCY_TTL_SEC", "30"))
+_ai_edit_results: TTLCache = TTLCache(maxsize=10_000, ttl=AI_EDIT_IDEMPOTENCY_TTL_SEC)
+# Per-key locks plus how many requests currently hold or wait on each, so a lock is only
+# discarded once nobody can still acquire it
+_ai_edit_locks: Dict[str, asyncio.Lock] = {}
+_ai_edit_lock_users: Dict[str, int] = {}
+
+
+# Agent runs (XML parsing, LangGraph streaming, tool execution) are blocking; run them on a
+# bounded worker pool so concurrent edits neither stall the event loop nor pile up unbounded
+AI_EDIT_MAX_WORKERS = int(os.getenv("AI_EDIT_MAX_WORKERS", str(os.cpu_count() or 4)))
+_ai_edit_executor = ThreadPoolExecutor(max_workers=AI_EDIT_MAX_WORKERS, thread_name_prefix="ai-edit")
+
+
+def _run_agent(working_file: str, original_file: str, prompt: str) -> Dict[str, Any]:
+    """Build the XLSForm agent and process a prompt synchronously (executed on the worker pool)."""
+    agent = create_proper_xlsform_agent(working_file, base_original_path=original_file)
+    return agent.process_prompt_sync(prompt)
+
+
+def _file_size(path: str) -> Optional[int]:
+    """Size of the file at `path` in bytes, or None if it can't be stat'ed."""
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def _latest_modified_file(directory: str, prefix: str) -> Optional[str]:
+    """Newest `{prefix}*.xml` file in `directory` by ctime, found in a single scandir pass."""
+    latest, latest_ctime = None, float("-inf")
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(prefix) and entry.name.endswith(".xml") and entry.is_file():
+                ctime = entry.stat().st_ctime
+                if ctime > latest_ctime:
+                    latest, latest_ctime = entry.path, ctime
+    return latest
+
+
+# The ORM session is synchronous; handlers that have to stay async (they stream uploads, run the
+# agent or await file I/O) push their queries through these on a worker thread, so the event
+# loop keeps serving other requests during the DB round trip
+def _execute_first(db: Session, stmt) -> Optional[Row]:
+    """Run a SELECT and return its first row."""
+    return db.execute(stmt).first()
+
+
+def _execute_and_commit(db: Session, stmt) -> None:
+    """Run a DML statement and commit it."""
+    db.execute(stmt)
+    db.commit()
+
+
+def _form_stem(path: str) -> str:
+    """Form name for an uploaded file path: its basename without the extension."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _ai_edit_idempotency_key(
+    user_id: int,
+    prompt: str,
+    target_sheet: Optional[str],
+    idempotency_key: Optional[str],
+    user_form_session: Optional[UserFormSession],
+) -> str:
+    """Derive the dedup key for an AI edit.
+
+    A client-supplied key is used as is. Otherwise the request payload is combined with the form
+    session and the file the edit applies to, so the same prompt on a newly uploaded (or since
+    edited) form is never answered with another file's result.
+    """
+    if idempotency_key:
+        raw = f"{user_id}|key|{idempotency_key}"
+    else:
+        session_id = working_file = None
+        if user_form_session is not None:
+            session_id = user_form_session.id
+            working_file = user_form_session.modified_file_path or user_form_session.original_file_path
+        raw = f"{user_id}|{session_id}|{working_file}|{prompt}|{target_sheet}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
 # =============== USER MANAGEMENT ENDPOINTS ===============
 
 
 @app.post("/api/users/register", response_model=UserResponse)
-async def create_user(user_data: UserCreate, db: Session = Depends(get_database_session)):
+def create_user(
+    user_data: UserCreate,
+    user_manager: UserManager = Depends(get_user_manager),
+    operation_logger: OperationLogger = Depends(get_operation_logger),
+):
     """
     Create a new user account
 
@@ -196,9 +467,6 @@ async def create_user(user_data: UserCreate, db: Session = Depends(get_database_
     - **phone**: Phone number (optional)
     """
     try:
-        user_manager = get_user_manager()
-        operation_logger = get_operation_logger()
-
         # Create user with EDITOR role by default
         new_user = user_manager.create_user(
             username=user_data.username,
@@ -214,21 +482,10 @@ async def create_user(user_data: UserCreate, db: Session = Depends(get_database_
         )
 
         if not new_user:
-            # Distinguish duplicate from other DB errors to avoid misleading 400s
-            from database_schema import User as DBUser
-
-            duplicate = (
-                db.query(DBUser)
-                .filter((DBUser.username == user_data.username) | (DBUser.email == user_data.email))
-                .first()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="User creation failed due to an internal error",
             )
-            if duplicate:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username or email already exists")
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="User creation failed due to an internal error",
-                )
 
         # Log user creation operation
         operation_logger.log_operation(
@@ -241,39 +498,39 @@ async def create_user(user_data: UserCreate, db: Session = Depends(get_database_
             success=True,
         )
 
-        return UserResponse(
-            id=new_user.id,
-            username=new_user.username,
-            email=new_user.email,
-            full_name=new_user.full_name,
-            role=(new_user.role.value if hasattr(new_user.role, "value") else new_user.role),
-            company=new_user.company or "",
-            department=new_user.department or "",
-            is_active=new_user.is_active,
-            is_verified=new_user.is_verified,
-            created_at=new_user.created_at,
-        )
+        return UserResponse.model_validate(new_user)
 
+    except IntegrityError as e:
+        # The username/email UNIQUE constraints detect duplicates without a pre-check query
+        # (23505 is Postgres' unique_violation; SQLite only reports it in the message)
+        message = str(e.orig).lower()
+        if getattr(e.orig, "pgcode", None) == "23505" or "unique" in message:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username or email already exists")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="User creation failed due to an internal error",
+        )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except HTTPException:
-        # Propagate HTTPExceptions (e.g., 400 duplicate user) without wrapping as 500
+        # Propagate HTTPExceptions without wrapping as 500
         raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"User creation failed: {str(e)}")
 
 
 @app.post("/api/auth/login", response_model=LoginResponse)
-async def login_user(login_data: LoginRequest, db: Session = Depends(get_database_session)):
+def login_user(
+    login_data: LoginRequest,
+    user_manager: UserManager = Depends(get_user_manager),
+    operation_logger: OperationLogger = Depends(get_operation_logger),
+):
     """
     Authenticate user and create session
 
     Returns session token for authenticated requests
     """
     try:
-        user_manager = get_user_manager()
-        operation_logger = get_operation_logger()
-
         # Authenticate user
         user = user_manager.authenticate_user(login_data.username, login_data.password)
 
@@ -295,6 +552,9 @@ async def login_user(login_data: LoginRequest, db: Session = Depends(get_databas
         if not session:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create session")
 
+        # Prime the auth cache so the first authenticated request skips the session lookup
+        cache_session_user(session.session_token, user, session.expires_at)
+
         # Log successful login
         operation_logger.log_operation(
             operation_type=OperationType.READ,
@@ -309,18 +569,7 @@ async def login_user(login_data: LoginRequest, db: Session = Depends(get_databas
         return LoginResponse(
             success=True,
             message="Login successful",
-            user=UserResponse(
-                id=user.id,
-                username=user.username,
-                email=user.email,
-                full_name=user.full_name,
-                role=(user.role.value if hasattr(user.role, "value") else user.role),
-                company=user.company or "",
-                department=user.department or "",
-                is_active=user.is_active,
-                is_verified=user.is_verified,
-                created_at=user.created_at,
-            ),
+            user=UserResponse.model_validate(user),
             session_token=session.session_token,
             expires_at=session.expires_at,
         )
@@ -331,78 +580,96 @@ async def login_user(login_data: LoginRequest, db: Session = Depends(get_databas
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Login failed: {str(e)}")
 
 
+def _terminate_user_session(session_token: str) -> Optional[int]:
+    """Mark a session token terminated; returns the owner's user id if an active session was ended."""
+    try:
+        with db_manager.get_session() as session:
+            user_id = session.execute(
+                update(UserSession)
+                .where(UserSession.session_token == session_token, UserSession.status == SessionStatus.ACTIVE)
+                .values(status=SessionStatus.TERMINATED, terminated_at=datetime.utcnow())
+                .returning(UserSession.user_id)
+            ).scalar()
+            session.commit()
+            return user_id
+    except Exception as e:
+        # swallow errors to keep idempotent behavior
+        logger.warning("Failed to terminate session on logout: %s", e)
+        return None
+    finally:
+        # Drop cached auth only once the row is no longer ACTIVE; a request racing the UPDATE
+        # could otherwise re-cache the token from the still-active row
+        invalidate_session_cache(session_token)
+
+
 @app.post("/api/auth/logout")
-async def logout_user(
-    authorization: Optional[str] = None,
-):
+def logout_user(authorization: Optional[str] = Header(None)):
     """
     Idempotent logout:
     - If a valid Bearer token is provided, terminate that session.
     - If token is missing/invalid/expired, still return success.
-    """
-    try:
-        from database_schema import UserSession
+    - Without a Bearer token there is nothing to do: `204 No Content`, nothing is written.
 
-        terminated = False
-        token_value: Optional[str] = None
-        if authorization:
-            try:
-                scheme, _, token = authorization.partition(" ")
-                if scheme.lower() == "bearer" and token:
-                    token_value = token.strip()
-            except Exception:
-                token_value = None
-        if token_value:
-            try:
-                with db_manager.get_session() as session:
-                    user_session = (
-                        session.query(UserSession)
-                        .filter(UserSession.session_token == token_value, UserSession.status == SessionStatus.ACTIVE)
-                        .first()
-                    )
-                    if user_session:
-                        user_session.status = SessionStatus.TERMINATED
-                        user_session.terminated_at = datetime.utcnow()
-                        session.commit()
-                        terminated = True
-            except Exception:
-                # swallow errors to keep idempotent behavior
-                pass
-        # Always return success
+    The session is terminated before the response is sent, so the token stops
+    authenticating as soon as logout returns.
+    """
+    token_value: Optional[str] = None
+    if authorization:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            token_value = token.strip()
+    if not token_value:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    user_id = _terminate_user_session(token_value)
+    if user_id is not None:
         get_operation_logger().log_operation(
             operation_type=OperationType.UPDATE,
-            description="User logout (idempotent)",
+            description="User logout",
             target_type="user_session",
+            user_id=user_id,
             success=True,
-            after_data={"terminated": terminated},
+            after_data={"terminated": True},
         )
-        return {"success": True, "message": "Logged out successfully"}
-    except Exception:
-        return {"success": True, "message": "Logged out successfully"}
+    return {"success": True, "message": "Logged out successfully"}
 
 
 # =============== SYSTEM STATUS ENDPOINTS ===============
 
 
+HEALTH_CACHE_TTL_SEC = float(os.getenv("HEALTH_CACHE_TTL_SEC", "10.0"))
+_health_cache: Dict[str, Any] = {"body": None, "checked_at": 0.0}
+
+
 @app.get("/api/health", response_model=HealthResponse)
-async def get_system_health():
+def get_system_health():
     """
     Get system health status including database connectivity
 
     Returns overall system status, database health, and statistics
     """
+    # Serve a recent healthy result so frequent load-balancer probes don't each hit the DB.
+    # Degraded/error results are never cached, so recovery is reported immediately.
+    # The healthy result is kept pre-serialized and returned as a plain Response, so cache
+    # hits skip FastAPI's response_model re-validation and re-encoding.
+    body = _health_cache["body"]
+    if body is not None and time.monotonic() - _health_cache["checked_at"] < HEALTH_CACHE_TTL_SEC:
+        return Response(content=body, media_type="application/json")
+
     try:
         # Get database health
         health_check = db_manager.health_check()
 
         if health_check["status"] == "healthy":
-            return HealthResponse(
+            response = HealthResponse(
                 status="healthy",
                 database_status="connected",
                 timestamp=datetime.utcnow(),
-                stats=health_check["stats"],
+                stats={**health_check["stats"], **db_manager.pool_stats()},
                 message="All systems operational",
             )
+            body = orjson.dumps(response.model_dump())
+            _health_cache.update(body=body, checked_at=time.monotonic())
+            return Response(content=body, media_type="application/json")
         else:
             return HealthResponse(
                 status="degraded",
@@ -424,13 +691,11 @@ async def get_system_health():
 
 # =============== ADMIN ENDPOINTS ===============
 @app.get("/api/debug/db")
-async def debug_database(admin_user: User = Depends(get_admin_user)):
+def debug_database(admin_user: SessionUser = Depends(get_admin_user)):
     """Admin-only DB diagnostics: connection test and health stats"""
     try:
-        from database import db_manager as dm
-
-        test = dm.test_connection()
-        health = dm.health_check()
+        test = db_manager.test_connection()
+        health = db_manager.health_check()
         return {
             "test": test,
             "health": health,
@@ -439,8 +704,208 @@ async def debug_database(admin_user: User = Depends(get_admin_user)):
         raise HTTPException(status_code=500, detail=f"DB debug failed: {str(e)}")
 
 
+# Per-statement cap for dashboard listings, enforced by Postgres (SET LOCAL, so it also holds
+# behind transaction poolers): a cancelled query frees its connection and the request gets a
+# 504. Other databases have no server-side cap; there the dashboard waits for its queries
+DASHBOARD_QUERY_TIMEOUT_SEC = float(os.getenv("DASHBOARD_QUERY_TIMEOUT_SEC", "10"))
+# SQLSTATE Postgres reports when statement_timeout cancels a query
+_PG_QUERY_CANCELED = "57014"
+
+
+def _limit_dashboard_statements(session: Session) -> None:
+    """Cap each remaining statement in the session's transaction at DASHBOARD_QUERY_TIMEOUT_SEC."""
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(
+            select(func.set_config("statement_timeout", str(int(DASHBOARD_QUERY_TIMEOUT_SEC * 1000)), True))
+        )
+
+
+def _load_dashboard_master_forms(session: Session) -> List[Dict[str, Any]]:
+    """Most recently created master forms with metadata."""
+    master_forms_stmt = (
+        select(
+            MasterForm.id,
+            MasterForm.form_id,
+            MasterForm.name,
+            MasterForm.description,
+            MasterForm.current_version,
+            MasterForm.version_count,
+            MasterForm.form_type,
+            MasterForm.equipment_types,
+            MasterForm.tags,
+            MasterForm.is_active,
+            MasterForm.usage_count,
+            MasterForm.field_count,
+            MasterForm.section_count,
+            MasterForm.file_size,
+            MasterForm.created_at,
+            MasterForm.updated_at,
+        )
+        .order_by(MasterForm.created_at.desc())
+        .limit(50)
+    )
+    return [dict(row) for row in session.execute(master_forms_stmt).mappings()]
+
+
+def _load_dashboard_form_versions(session: Session) -> List[Dict[str, Any]]:
+    """Most recent form versions, with their master form's name."""
+    versions_stmt = (
+        select(
+            FormVersion.id,
+            FormVersion.master_form_id,
+            FormVersion.version,
+            FormVersion.is_current,
+            FormVersion.is_published,
+            FormVersion.file_size,
+            FormVersion.created_by,
+            FormVersion.change_summary,
+            FormVersion.created_at,
+            MasterForm.name.label("master_form_name"),
+        )
+        .outerjoin(MasterForm, FormVersion.master_form_id == MasterForm.id)
+        .order_by(FormVersion.created_at.desc())
+        .limit(100)
+    )
+    return [dict(row) for row in session.execute(versions_stmt).mappings()]
+
+
+def _load_dashboard_prompts(session: Session) -> List[Dict[str, Any]]:
+    """User prompts from edit history, shown on the dashboard as "requests"."""
+    prompt_sessions_stmt = (
+        select(UserFormSession.id, UserFormSession.user_id, UserFormSession.edit_history_json)
+        .where(UserFormSession.edit_history_json.isnot(None))
+        .order_by(UserFormSession.updated_at.desc())
+        .limit(DASHBOARD_PROMPT_SESSION_LIMIT)
+    )
+    all_prompts = []
+    for session_obj in session.execute(prompt_sessions_stmt):
+        if session_obj.edit_history_json:
+            for edit in session_obj.edit_history_json:
+                all_prompts.append(
+                    {
+                        "id": f"{session_obj.id}_{len(all_prompts)}",
+                        "prompt": edit.get("prompt", ""),
+                        "target_sheet": edit.get("target_sheet"),
+                        "success": edit.get("success", False),
+                        "timestamp": edit.get("timestamp"),
+                        "user_id": session_obj.user_id,
+                        "status": "completed" if edit.get("success", False) else "failed",
+                    }
+                )
+
+    # Sort by timestamp (most recent first)
+    all_prompts.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+    return all_prompts[:100]  # Limit to 100 most recent
+
+
+def _load_dashboard_operations(session: Session) -> List[Dict[str, Any]]:
+    """Recent operations (audit log) with the acting user's name."""
+    operations_stmt = (
+        select(
+            FormOperation.id,
+            FormOperation.operation_id,
+            FormOperation.operation_type,
+            FormOperation.operation_description,
+            FormOperation.target_type,
+            FormOperation.target_id,
+            FormOperation.target_name,
+            FormOperation.user_id,
+            FormOperation.success,
+            FormOperation.error_message,
+            FormOperation.execution_time_ms,
+            FormOperation.started_at,
+            FormOperation.completed_at,
+            User.username,
+        )
+        .outerjoin(User, FormOperation.user_id == User.id)
+        .where(_DASHBOARD_OPERATIONS)
+        .order_by(FormOperation.started_at.desc())
+        .limit(200)
+    )
+    recent_operations = []
+    for row in session.execute(operations_stmt).mappings():
+        op = dict(row)
+        op["operation_type"] = row["operation_type"].value
+        recent_operations.append(op)
+    return recent_operations
+
+
+def _load_dashboard_sessions(session: Session) -> List[Dict[str, Any]]:
+    """Active user sessions, most recently active first."""
+    sessions_stmt = (
+        select(
+            UserSession.id,
+            UserSession.user_id,
+            # Only the prefix leaves the database; full tokens are never shown
+            func.substr(UserSession.session_token, 1, 8).label("token_prefix"),
+            UserSession.ip_address,
+            UserSession.status,
+            UserSession.expires_at,
+            UserSession.last_activity,
+            UserSession.created_at,
+            User.username,
+            User.role.label("user_role"),
+        )
+        .outerjoin(User, UserSession.user_id == User.id)
+        .where(UserSession.status == SessionStatus.ACTIVE)
+        .order_by(UserSession.last_activity.desc())
+        .limit(100)
+    )
+    active_sessions = []
+    for row in session.execute(sessions_stmt).mappings():
+        active_sessions.append(
+            {
+                "id": row["id"],
+                "user_id": row["user_id"],
+                "session_token": f"{row['token_prefix']}...",  # Truncate for security
+                "ip_address": str(row["ip_address"]) if row["ip_address"] else None,
+                "status": row["status"].value,
+                "expires_at": row["expires_at"],
+                "last_activity": row["last_activity"],
+                "created_at": row["created_at"],
+                "username": row["username"],
+                "user_role": row["user_role"].value if row["user_role"] else None,
+            }
+        )
+    return active_sessions
+
+
+def _load_dashboard_stats(session: Session) -> Dict[str, Any]:
+    """Table counts plus the dashboard's own aggregates."""
+    stats = get_database_stats(
+        session,
+        select(func.coalesce(func.sum(MasterForm.file_size), 0)).scalar_subquery().label("total_file_size"),
+        select(func.coalesce(func.sum(case((FormOperation.success == True, 1), else_=0)), 0))
+        .where(_DASHBOARD_OPERATIONS)
+        .scalar_subquery()
+        .label("successful_operations"),
+        select(func.coalesce(func.sum(case((FormOperation.success == False, 1), else_=0)), 0))
+        .where(_DASHBOARD_OPERATIONS)
+        .scalar_subquery()
+        .label("failed_operations"),
+        select(func.count(FormOperation.id))
+        .where(FormOperation.target_type == "admin_dashboard")
+        .scalar_subquery()
+        .label("dashboard_reads"),
+    )
+    stats.update(
+        {
+            "form_operations": stats["form_operations"] - stats.pop("dashboard_reads"),
+            "total_file_size": int(stats["total_file_size"]),
+            "avg_processing_time": 0,  # Not applicable for user prompts
+            "successful_operations": int(stats["successful_operations"]),
+            "failed_operations": int(stats["failed_operations"]),
+        }
+    )
+    return stats
+
+
 @app.get("/api/admin/dashboard", response_model=AdminDashboardResponse)
-async def get_admin_dashboard(admin_user: User = Depends(get_admin_user), db: Session = Depends(get_database_session)):
+def get_admin_dashboard(
+    if_none_match: Optional[str] = Header(None),
+    admin_user: SessionUser = Depends(get_admin_user),
+    db: Session = Depends(get_database_session),
+):
     """
     Get comprehensive admin dashboard data
 
@@ -452,150 +917,58 @@ async def get_admin_dashboard(admin_user: User = Depends(get_admin_user), db: Se
     - Active user sessions
     - System statistics
 
-    Requires admin privileges.
+    Requires admin privileges. Responses carry an ETag; send it back in `If-None-Match`
+    to get `304 Not Modified` while nothing on the dashboard has changed.
     """
     try:
-        print(f"🔍 Admin dashboard accessed by: {admin_user.username}")
+        logger.debug("Admin dashboard accessed by: %s", admin_user.username)
         operation_logger = get_operation_logger()
 
         # Use the passed db session instead of creating a new one
         session = db
-        from sqlalchemy import func
-
-        from database_schema import FormOperation, FormVersion, MasterForm, User, UserFormSession, UserSession
-
-        # Get master forms with metadata
-        master_forms_query = session.query(MasterForm).order_by(MasterForm.created_at.desc()).limit(50)
-        master_forms = []
-        print(f"📊 Found {master_forms_query.count()} master forms")
-        for form in master_forms_query:
-            master_forms.append(
-                {
-                    "id": form.id,
-                    "form_id": form.form_id,
-                    "name": form.name,
-                    "description": form.description,
-                    "current_version": form.current_version,
-                    "version_count": form.version_count,
-                    "form_type": form.form_type,
-                    "equipment_types": form.equipment_types,
-                    "tags": form.tags,
-                    "is_active": form.is_active,
-                    "usage_count": form.usage_count,
-                    "field_count": form.field_count,
-                    "section_count": form.section_count,
-                    "file_size": form.file_size,
-                    "created_at": form.created_at.isoformat(),
-                    "updated_at": form.updated_at.isoformat(),
-                }
-            )
 
-        # Get form versions
-        versions_query = session.query(FormVersion).order_by(FormVersion.created_at.desc()).limit(100)
-        form_versions = []
-        for version in versions_query:
-            form_versions.append(
-                {
-                    "id": version.id,
-                    "master_form_id": version.master_form_id,
-                    "version": version.version,
-                    "is_current": version.is_current,
-                    "is_published": version.is_published,
-                    "file_size": version.file_size,
-                    "created_by": version.created_by,
-                    "change_summary": version.change_summary,
-                    "created_at": version.created_at.isoformat(),
-                    "master_form_name": version.master_form.name if version.master_form else None,
-                }
-            )
-
-        # Get user prompts from edit history as "requests"
-        user_form_sessions = session.query(UserFormSession).all()
-        all_prompts = []
-        for session_obj in user_form_sessions:
-            if session_obj.edit_history_json:
-                for edit in session_obj.edit_history_json:
-                    all_prompts.append(
-                        {
-                            "id": f"{session_obj.id}_{len(all_prompts)}",
-                            "prompt": edit.get("prompt", ""),
-                            "target_sheet": edit.get("target_sheet"),
-                            "success": edit.get("success", False),
-                            "timestamp": edit.get("timestamp"),
-                            "user_id": session_obj.user_id,
-                            "status": "completed" if edit.get("success", False) else "failed",
-                        }
-                    )
-
-        # Sort by timestamp (most recent first)
-        all_prompts.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        customization_requests = all_prompts[:100]  # Limit to 100 most recent
-        print(f"📋 Found {len(customization_requests)} user prompts (requests)")
-
-        # Get recent operations (audit log)
-        operations_query = session.query(FormOperation).order_by(FormOperation.started_at.desc()).limit(200)
-        recent_operations = []
-        print(f"🔧 Found {operations_query.count()} operations")
-        for op in operations_query:
-            recent_operations.append(
-                {
-                    "id": op.id,
-                    "operation_id": op.operation_id,
-                    "operation_type": op.operation_type.value,
-                    "operation_description": op.operation_description,
-                    "target_type": op.target_type,
-                    "target_id": op.target_id,
-                    "target_name": op.target_name,
-                    "user_id": op.user_id,
-                    "success": op.success,
-                    "error_message": op.error_message,
-                    "execution_time_ms": op.execution_time_ms,
-                    "started_at": op.started_at.isoformat(),
-                    "completed_at": op.completed_at.isoformat() if op.completed_at else None,
-                    "username": op.user.username if op.user else None,
-                }
+        # Change marker (see _DASHBOARD_TAG_COLUMNS) plus the current TTL bucket, in one round-trip
+        tag_row = session.execute(select(*_DASHBOARD_TAG_COLUMNS)).one()
+        tag_source = (tuple(tag_row), int(time.time() // DASHBOARD_CACHE_TTL_SEC))
+        etag = f'"{hashlib.blake2b(repr(tag_source).encode(), digest_size=16).hexdigest()}"'
+        if if_none_match and etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+            operation_logger.log_operation(
+                operation_type=OperationType.READ,
+                description=f"Admin dashboard accessed by: {admin_user.username} (not modified)",
+                target_type="admin_dashboard",
+                user_id=admin_user.id,
+                success=True,
             )
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
-        # Get active sessions
-        sessions_query = (
-            session.query(UserSession)
-            .filter(UserSession.status == SessionStatus.ACTIVE)
-            .order_by(UserSession.last_activity.desc())
-            .limit(100)
-        )
-        active_sessions = []
-        for sess in sessions_query:
-            active_sessions.append(
-                {
-                    "id": sess.id,
-                    "user_id": sess.user_id,
-                    "session_token": sess.session_token[:8] + "...",  # Truncate for security
-                    "ip_address": str(sess.ip_address) if sess.ip_address else None,
-                    "status": sess.status.value,
-                    "expires_at": sess.expires_at.isoformat(),
-                    "last_activity": sess.last_activity.isoformat(),
-                    "created_at": sess.created_at.isoformat(),
-                    "username": sess.user.username if sess.user else None,
-                    "user_role": sess.user.role.value if sess.user else None,
-                }
+        # Another admin (or a client without the tag) already rendered this exact state; its
+        # `timestamp` says when, so clients can still show how fresh the data is
+        body = _dashboard_cache.get(etag)
+        if body is not None:
+            operation_logger.log_operation(
+                operation_type=OperationType.READ,
+                description=f"Admin dashboard accessed by: {admin_user.username}",
+                target_type="admin_dashboard",
+                user_id=admin_user.id,
+                success=True,
             )
-
-        # Get comprehensive statistics
-        from database_schema import get_database_stats
-
-        stats = get_database_stats(session)
-
-        # Add additional stats
-        stats.update(
-            {
-                "total_file_size": session.query(func.sum(MasterForm.file_size))
-                .filter(MasterForm.file_size.isnot(None))
-                .scalar()
-                or 0,
-                "avg_processing_time": 0,  # Not applicable for user prompts
-                "successful_operations": session.query(FormOperation).filter(FormOperation.success == True).count(),
-                "failed_operations": session.query(FormOperation).filter(FormOperation.success == False).count(),
-            }
+            return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+        # Listings are read-only: select plain columns (Core rows) instead of hydrating ORM objects.
+        # They are cheap indexed reads, so they run one after another on the request's own
+        # connection rather than checking out a pooled connection each
+        _limit_dashboard_statements(session)
+        master_forms = _load_dashboard_master_forms(session)
+        form_versions = _load_dashboard_form_versions(session)
+        customization_requests = _load_dashboard_prompts(session)
+        recent_operations = _load_dashboard_operations(session)
+        active_sessions = _load_dashboard_sessions(session)
+        stats = _load_dashboard_stats(session)
+        logger.debug(
+            "Dashboard found %d master forms, %d user prompts (requests), %d operations",
+            len(master_forms),
+            len(customization_requests),
+            len(recent_operations),
         )
 
         # Log admin dashboard access
@@ -607,16 +980,35 @@ async def get_admin_dashboard(admin_user: User = Depends(get_admin_user), db: Se
             success=True,
         )
 
-        return AdminDashboardResponse(
-            master_forms=master_forms,
-            form_versions=form_versions,
-            customization_requests=customization_requests,
-            recent_operations=recent_operations,
-            active_sessions=active_sessions,
-            stats=stats,
-            timestamp=datetime.utcnow(),
+        # Serialize once with orjson and return the bytes directly: building AdminDashboardResponse
+        # and letting FastAPI re-validate it against response_model walked every listed row twice.
+        # The model still documents the payload's shape.
+        body = orjson.dumps(
+            {
+                "master_forms": master_forms,
+                "form_versions": form_versions,
+                "customization_requests": customization_requests,
+                "recent_operations": recent_operations,
+                "active_sessions": active_sessions,
+                "stats": stats,
+                "timestamp": datetime.utcnow(),
+            }
         )
+        _dashboard_cache[etag] = body
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
+    except HTTPException:
+        raise
+    except OperationalError as e:
+        if getattr(e.orig, "pgcode", None) != _PG_QUERY_CANCELED:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to fetch admin dashboard data: {str(e)}"
+            )
+        logger.warning("Admin dashboard query exceeded %ss statement timeout", DASHBOARD_QUERY_TIMEOUT_SEC)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Dashboard queries exceeded {DASHBOARD_QUERY_TIMEOUT_SEC:g}s budget",
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to fetch admin dashboard data: {str(e)}"
@@ -627,10 +1019,10 @@ async def get_admin_dashboard(admin_user: User = Depends(get_admin_user), db: Se
 
 
 @app.put("/api/admin/users/{user_id}/role")
-async def update_user_role(
+def update_user_role(
     user_id: int,
     payload: UpdateUserRoleRequest,
-    admin_user: User = Depends(get_admin_user),
+    admin_user: SessionUser = Depends(get_admin_user),
     db: Session = Depends(get_database_session),
 ):
     """Promote/demote users between admin and editor. Admin-only.
@@ -641,10 +1033,7 @@ async def update_user_role(
         if role_target not in {"admin", "editor"}:
             raise HTTPException(status_code=400, detail="Role must be 'admin' or 'editor'")
 
-        from database_schema import User as DBUser
-        from database_schema import UserRole as UR
-
-        user = db.query(DBUser).filter(DBUser.id == user_id).first()
+        user = db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -654,14 +1043,17 @@ async def update_user_role(
 
         # If demoting from admin, ensure there will be at least one admin left
         if current_role == "admin" and role_target != "admin":
-            remaining_admins = db.query(DBUser).filter(DBUser.role == UR.ADMIN.value, DBUser.id != user_id).count()
-            if remaining_admins == 0:
+            # EXISTS stops at the first other admin instead of counting them
+            other_admin = db.execute(
+                select(exists().where(User.role == UserRole.ADMIN.value, User.id != user_id))
+            ).scalar()
+            if not other_admin:
                 raise HTTPException(status_code=400, detail="Cannot demote the last remaining admin")
 
         # Apply role change
         user.role = role_target
         db.commit()
-        db.refresh(user)
+        invalidate_user_sessions_cache(user_id)
 
         # Audit log
         operation_logger = get_operation_logger()
@@ -683,27 +1075,58 @@ async def update_user_role(
         raise HTTPException(status_code=500, detail=f"Failed to update role: {str(e)}")
 
 
+# Built once at import; list_users only executes it
+_LIST_USERS_STMT = (
+    select(
+        User.id,
+        User.username,
+        User.email,
+        User.full_name,
+        User.role,
+        User.is_active,
+        User.created_at,
+    )
+    .order_by(User.created_at.desc())
+    .limit(500)
+)
+
+
+def _serialize_user_row(u: Row) -> Dict[str, Any]:
+    """JSON-ready dict for one row of _LIST_USERS_STMT."""
+    role_value = u.role.value if hasattr(u.role, "value") else u.role
+    return {
+        "id": u.id,
+        "username": u.username,
+        "email": u.email,
+        "full_name": u.full_name,
+        "role": role_value,
+        "is_active": u.is_active,
+        "created_at": u.created_at,
+    }
+
+
 @app.get("/api/admin/users")
-async def list_users(admin_user: User = Depends(get_admin_user), db: Session = Depends(get_database_session)):
-    """List users for admin management (id, username, email, role, is_active, created_at)."""
+def list_users(
+    accept: Optional[str] = Header(None),
+    admin_user: SessionUser = Depends(get_admin_user),
+    db: Session = Depends(get_database_session),
+):
+    """List users for admin management (id, username, email, role, is_active, created_at).
+
+    Send `Accept: application/x-ndjson` to stream one JSON user object per line instead.
+    """
     try:
-        from database_schema import User as DBUser
+        if accept and "application/x-ndjson" in accept:
 
-        users = db.query(DBUser).order_by(DBUser.created_at.desc()).limit(500).all()
+            def stream_users():
+                # Own session: the request-scoped one is closed before the body finishes streaming
+                with db_manager.get_session() as session:
+                    for u in session.execute(_LIST_USERS_STMT.execution_options(yield_per=200)):
+                        yield orjson.dumps(_serialize_user_row(u)) + b"\n"
 
-        def serialize(u):
-            role_value = u.role.value if hasattr(u.role, "value") else u.role
-            return {
-                "id": u.id,
-                "username": u.username,
-                "email": u.email,
-                "full_name": u.full_name,
-                "role": role_value,
-                "is_active": u.is_active,
-                "created_at": u.created_at.isoformat() if u.created_at else None,
-            }
+            return StreamingResponse(stream_users(), media_type="application/x-ndjson")
 
-        return {"users": [serialize(u) for u in users]}
+        return {"users": [_serialize_user_row(u) for u in db.execute(_LIST_USERS_STMT)]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list users: {str(e)}")
 
@@ -711,10 +1134,24 @@ async def list_users(admin_user: User = Depends(get_admin_user), db: Session = D
 # Customization request endpoint removed - using user prompts instead
 
 
+def _analyze_form(file_path: str) -> Dict[str, Any]:
+    """Summarise an uploaded form's worksheets (blocking; run off the event loop).
+
+    Streams the file and keeps only each table's header row, so analysis never holds the whole
+    document tree; the AI-edit path parses the full tree when it needs it.
+    """
+    worksheets_info = scan_worksheet_headers(file_path)
+    headers_by_sheet = {name: info["headers"] for name, info in worksheets_info.items()}
+    return {
+        "worksheets": worksheets_info,
+        "detected_choice_sheets": choice_worksheets_from_headers(headers_by_sheet),
+    }
+
+
 @app.post("/api/upload")
 async def upload_file(
     file: UploadFile = File(...),
-    current_user: User = Depends(require_editor_user),
+    current_user: SessionUser = Depends(require_editor_user),
     db: Session = Depends(get_database_session),
 ):
     """
@@ -734,53 +1171,40 @@ async def upload_file(
     base_dir.mkdir(parents=True, exist_ok=True)
     file_path = base_dir / file.filename
 
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Stream the upload to disk in 1 MiB chunks instead of buffering the whole body
+    file_size = 0
+    async with aiofiles.open(file_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > UPLOAD_MAX_BYTES:
+                break
+            await f.write(chunk)
+    if file_size > UPLOAD_MAX_BYTES:
+        shutil.rmtree(base_dir, ignore_errors=True)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large (limit {UPLOAD_MAX_BYTES} bytes)",
+        )
 
     try:
-        # Analyze the uploaded file using the XML editor utilities
-        editor = create_xml_editor(str(file_path))
-        # Build a lightweight analysis: worksheets and headers
-        worksheets_info: Dict[str, Any] = {}
-        try:
-            # Access internal helpers in a safe way
-            all_ws = editor._iter_worksheets() if hasattr(editor, "_iter_worksheets") else []
-            for ws in all_ws:
-                # Worksheet name attribute
-                name_attr = ws.get("{urn:schemas-microsoft-com:office:spreadsheet}Name") or ""
-                table = editor.find_table_in_worksheet(ws) if hasattr(editor, "find_table_in_worksheet") else None
-                headers = editor.get_headers(table) if table is not None and hasattr(editor, "get_headers") else []
-                worksheets_info[name_attr] = {
-                    "headers": headers,
-                    "row_count": int(table.get("{urn:schemas-microsoft-com:office:spreadsheet}ExpandedRowCount", "0"))
-                    if table is not None
-                    else 0,
-                }
-        except Exception:
-            worksheets_info = {}
-
-        form_analysis: Dict[str, Any] = {
-            "worksheets": worksheets_info,
-            "detected_choice_sheets": editor.detect_choice_worksheets()
-            if hasattr(editor, "detect_choice_worksheets")
-            else [],
-        }
+        # XML parsing is CPU-bound; keep it off the event loop
+        form_analysis = await asyncio.to_thread(_analyze_form, str(file_path))
 
         # Persist user form session
-        from database_schema import FormWorkStatus, UserFormSession
-
-        user_form_session = UserFormSession(
-            id=session_uuid,
-            user_id=current_user.id,
-            status=FormWorkStatus.ACTIVE.value,
-            original_file_path=str(file_path),
-            modified_file_path=None,
-            analysis_json=form_analysis,
-            edit_history_json=[],
+        await asyncio.to_thread(
+            _execute_and_commit,
+            db,
+            insert(UserFormSession).values(
+                id=session_uuid,
+                user_id=current_user.id,
+                status=FormWorkStatus.ACTIVE.value,
+                original_file_path=str(file_path),
+                modified_file_path=None,
+                analysis_json=form_analysis,
+                edit_history_json=[],
+            ),
         )
-        db.add(user_form_session)
-        db.commit()
+        _invalidate_status_cache(current_user.id)
 
         # Log file upload operation
         operation_logger = get_operation_logger()
@@ -793,7 +1217,7 @@ async def upload_file(
             success=True,
             after_data={
                 "file_path": str(file_path),
-                "file_size": len(content),
+                "file_size": file_size,
                 "worksheets": list(form_analysis.get("worksheets", {}).keys()),
                 "user_form_session_id": session_uuid,
             },
@@ -828,8 +1252,11 @@ async def upload_file(
 @app.post("/api/ai-edit")
 async def ai_edit_endpoint(
     prompt: str,
+    background_tasks: BackgroundTasks,
     target_sheet: Optional[str] = None,
-    current_user: User = Depends(require_editor_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: SessionUser = Depends(require_editor_user),
+    user_form_session: Optional[UserFormSession] = Depends(get_active_form_session),
     db: Session = Depends(get_database_session),
 ):
     """
@@ -845,202 +1272,266 @@ async def ai_edit_endpoint(
     2. Execute changes on the XML file
     3. Save a modified version with timestamp
     4. Return success/failure status
+
+    Identical submissions (same `Idempotency-Key` header, or same prompt and target
+    sheet on the same form session and working file when no key is sent) within a short
+    window return the earlier result.
     """
-    # Find the user's active form session
-    from database_schema import FormWorkStatus, UserFormSession
+    if len(prompt) > AI_EDIT_MAX_PROMPT_CHARS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Prompt too large ({len(prompt)} > {AI_EDIT_MAX_PROMPT_CHARS} characters)",
+        )
+    key = _ai_edit_idempotency_key(current_user.id, prompt, target_sheet, idempotency_key, user_form_session)
+    lock = _ai_edit_locks.setdefault(key, asyncio.Lock())
+    _ai_edit_lock_users[key] = _ai_edit_lock_users.get(key, 0) + 1
+    try:
+        async with lock:
+            cached = _ai_edit_results.get(key)
+            if cached is not None:
+                return cached
+            response = await _apply_ai_edit(prompt, target_sheet, current_user, user_form_session, db, background_tasks)
+            if not response.get("success"):
+                # Agent/LLM failures are often transient: let a retry make a fresh attempt
+                return response
+            _ai_edit_results[key] = response
+            if not idempotency_key:
+                # The edit moved the session onto a new working file; a retry sent after this
+                # response derives its key from that file, so file the result under it as well
+                _ai_edit_results[
+                    _ai_edit_idempotency_key(current_user.id, prompt, target_sheet, None, user_form_session)
+                ] = response
+            return response
+    finally:
+        _ai_edit_lock_users[key] -= 1
+        if not _ai_edit_lock_users[key]:
+            del _ai_edit_lock_users[key]
+            _ai_edit_locks.pop(key, None)
+
+
+def _save_form_version(
+    form_name: str,
+    modified_path: str,
+    xml_content: Optional[str],
+    change_summary: str,
+    user_id: int,
+    timestamp_version: str,
+) -> None:
+    """Persist an AI edit's output as a form version (runs as a background task after the response)."""
+    try:
+        # Modified XML content: reuse what the agent just wrote, else read it back from disk
+        if xml_content is None:
+            xml_content = ""
+            try:
+                with open(modified_path, "r", encoding="utf-8") as xf:
+                    xml_content = xf.read()
+                logger.debug("Read XML content: %d characters from %s", len(xml_content), modified_path)
+            except Exception as e:
+                logger.warning("Failed to read XML content from %s: %s", modified_path, e)
+        xml_bytes = xml_content.encode("utf-8")
+        file_size = len(xml_bytes) if xml_content else None
+        # Same SHA-256 hex digest create_master_form stores, so any two versions are comparable
+        file_checksum = hashlib.sha256(xml_bytes).hexdigest() if xml_content else None
+
+        with db_manager.get_session() as db:
+            # Find the master form and this user's latest checksum for it in one round-trip
+            latest_checksum_subq = (
+                select(FormVersion.file_checksum)
+                .where(FormVersion.master_form_id == MasterForm.id, FormVersion.created_by == user_id)
+                .order_by(FormVersion.created_at.desc())
+                .limit(1)
+                .correlate(MasterForm)
+                .scalar_subquery()
+            )
+            master_row = db.execute(
+                select(MasterForm.id, latest_checksum_subq.label("latest_checksum"))
+                .where(MasterForm.name == form_name)
+                .limit(1)
+            ).first()
+
+            if master_row is None:
+                # Restore previous behavior: create master form record when missing
+                form_manager = get_form_manager()
+                form_manager.create_master_form(
+                    name=form_name,
+                    version=timestamp_version,
+                    xml_content=xml_content or "",
+                    description=f"Auto-created from edits for {form_name}",
+                    form_type="General",
+                    equipment_types=[],
+                    tags=[],
+                    created_by=user_id,
+                )
+            else:
+                master_form_id = master_row.id
+                # Skip no-op edits: identical XML to this user's latest version of the form
+                if file_checksum is not None and master_row.latest_checksum == file_checksum:
+                    logger.debug("XML unchanged since the last version of %s; not saving a new version", form_name)
+                    return
+
+                # For existing master form, add a new version as a draft (do not mark as current).
+                # INSERT ... RETURNING hands back the generated id in the same round-trip.
+                new_version = db.execute(
+                    insert(FormVersion)
+                    .values(
+                        master_form_id=master_form_id,
+                        version=f"{form_name}_{timestamp_version}",  # Descriptive version name
+                        xml_content=compress_xml(xml_content) if xml_content else "",
+                        xml_compressed=bool(xml_content),
+                        form_structure=None,
+                        field_names=None,
+                        choice_lists=None,
+                        file_path=modified_path,
+                        file_size=file_size,
+                        file_checksum=file_checksum,
+                        created_by=user_id,
+                        change_summary=change_summary,
+                        is_current=False,
+                        is_published=False,
+                    )
+                    .returning(FormVersion.id, FormVersion.version)
+                ).one()
+                db.commit()
+                logger.debug(
+                    "Saved version %s to DB: %s with %d characters", new_version.id, new_version.version, len(xml_content)
+                )
+        # The status display name comes from the latest version
+        _invalidate_status_cache(user_id)
 
-    user_form_session = (
-        db.query(UserFormSession)
-        .filter(UserFormSession.user_id == current_user.id, UserFormSession.status == FormWorkStatus.ACTIVE.value)
-        .order_by(UserFormSession.created_at.desc())
-        .first()
-    )
+    except Exception as e:
+        logger.error("Failed to save version to DB: %s", e)
+        # Non-fatal: the edit itself has already been applied and reported
+        operation_logger = get_operation_logger()
+        operation_logger.log_operation(
+            operation_type=OperationType.UPDATE,
+            description=f"Version save failed for {form_name}",
+            target_type="form_version",
+            target_name=form_name,
+            user_id=user_id,
+            success=False,
+            error_message=str(e),
+        )
 
+
+async def _apply_ai_edit(
+    prompt: str,
+    target_sheet: Optional[str],
+    current_user: SessionUser,
+    user_form_session: Optional[UserFormSession],
+    db: Session,
+    background_tasks: BackgroundTasks,
+):
+    """Run the agent against the user's active form session and persist the outcome."""
     if not user_form_session or not user_form_session.original_file_path:
         raise HTTPException(status_code=400, detail="No form uploaded. Please upload an XML file first.")
 
+    # Truncated prompt used in audit-log descriptions and the saved version's summary
+    prompt_preview = prompt[:100]
+    change_summary = f"AI edit: {prompt[:50]}..." if len(prompt) > 50 else f"AI edit: {prompt}"
+
     try:
-        # Create LangGraph ReAct Agent
+        # Path-derived values used several times below, computed once
+        original_path = user_form_session.original_file_path
+        form_name = _form_stem(original_path)
+
         # Choose working file: prefer last modified, else original
-        working_file = user_form_session.modified_file_path or user_form_session.original_file_path
-        agent = create_proper_xlsform_agent(working_file, base_original_path=user_form_session.original_file_path)
+        working_file = user_form_session.modified_file_path or original_path
 
         # Add target sheet context to prompt if specified
         enhanced_prompt = prompt
         if target_sheet:
             enhanced_prompt = f"Focus on the '{target_sheet}' sheet. {prompt}"
 
-        # Process the prompt using the ReAct agent
-        print(f"🔍 Processing AI edit prompt: {enhanced_prompt}")
-        result = await agent.process_prompt(enhanced_prompt)
-        print(f"🔍 AI edit result: {result}")
-
-        # Store the prompt in edit history
-        edit_history = user_form_session.edit_history_json or []
-        edit_history.append(
-            {
-                "timestamp": datetime.utcnow().isoformat(),
-                "prompt": prompt,
-                "target_sheet": target_sheet,
-                "success": result.get("success", False),
-                "response": result.get("agent_response", ""),
-            }
+        # Create the LangGraph ReAct agent and process the prompt on the worker pool
+        logger.debug("Processing AI edit prompt: %s", enhanced_prompt)
+        result = await asyncio.get_running_loop().run_in_executor(
+            _ai_edit_executor, _run_agent, working_file, original_path, enhanced_prompt
         )
-        user_form_session.edit_history_json = edit_history
+        agent_xml = result.pop("xml_content", None)
+        logger.debug("AI edit result: %s", result)
+
+        # One clock read per edit, shared by the history entry and the version name
+        now = datetime.now(timezone.utc)
+
+        # Edit history entry for this prompt; recorded once the outcome is known
+        history_entry = {
+            "timestamp": now.isoformat(),
+            "prompt": prompt,
+            "target_sheet": target_sheet,
+            "success": result.get("success", False),
+            "response": result.get("agent_response", ""),
+        }
 
         if result["success"]:
             # Check for modified file
             modified_file_created = False
-            # Locate latest modified file next to original
-            import glob
-
-            original_name = os.path.basename(user_form_session.original_file_path).replace(".xml", "")
-            pattern = str(Path(user_form_session.original_file_path).parent / f"modified_*.xml")
-            print(f"🔍 Looking for modified files with pattern: {pattern}")
-            modified_files = glob.glob(pattern)
-            print(f"🔍 Found {len(modified_files)} modified files: {modified_files}")
-            latest_modified = None
-            if modified_files:
-                latest_modified = max(modified_files, key=os.path.getctime)
+            # Prefer the file the agent's tools reported writing; only scan next to the original without one
+            reported_path = result.get("modified_file_path")
+            latest_modified = reported_path
+            if not latest_modified:
+                original_dir = os.path.dirname(original_path)
+                logger.debug("Looking for modified files in: %s", original_dir)
+                latest_modified = await asyncio.to_thread(_latest_modified_file, original_dir, "modified_")
+            if latest_modified:
+                latest_modified = os.path.abspath(latest_modified)
                 modified_file_created = True
-                print(f"✅ Using latest modified file: {latest_modified}")
+                logger.debug("Using latest modified file: %s", latest_modified)
 
             # Check for success indicators
-            success_indicators = [
-                "successfully added",
-                "added choice option",
-                "modified_file_path",
-                "_modified.xml",
-                "backup_created",
-            ]
-
-            response_lower = result["agent_response"].lower()
-            actual_success = any(indicator.lower() in response_lower for indicator in success_indicators)
+            actual_success = _EDIT_SUCCESS_RE.search(result["agent_response"]) is not None
 
             # Require tool calls and modified file for success
             tool_calls_made = int(result.get("tool_calls_made", 0) or 0)
             agent_response = result.get("agent_response", "")
 
             # Check for successful task execution in the response
-            has_successful_tasks = any(
-                [
-                    '"status": "completed"' in agent_response,
-                    '"completed_tasks"' in agent_response,
-                    "Successfully completed" in agent_response,
-                    "✅" in agent_response,
-                    '"execution_completed": true' in agent_response,
-                ]
-            )
+            has_successful_tasks = _TASKS_COMPLETED_RE.search(agent_response) is not None
 
             if tool_calls_made == 0 and not has_successful_tasks:
                 raise HTTPException(status_code=422, detail="AI did not execute tools or no modified file was produced")
 
-            # Persist changes to user form session
-            history = user_form_session.edit_history_json or []
             # Determine if changes were actually applied
             changes_applied = modified_file_created or has_successful_tasks
-            success = changes_applied or actual_success
-
-            history.append(
-                {
-                    "timestamp": datetime.now().isoformat(),
-                    "prompt": prompt,
-                    "target_sheet": target_sheet,
-                    "success": success,
-                    "changes_applied": changes_applied,
-                }
-            )
-            user_form_session.edit_history_json = history
+            history_entry["success"] = changes_applied or actual_success
+            history_entry["changes_applied"] = changes_applied
+
+            # Persist changes to user form session (edit_history_json is a MutableList, so
+            # appending and trimming in place is tracked without reassigning the column)
+            if user_form_session.edit_history_json is None:
+                user_form_session.edit_history_json = []
+            history = user_form_session.edit_history_json
+            history.append(history_entry)
+            del history[:-EDIT_HISTORY_MAX_ENTRIES]
             if latest_modified:
                 # Store absolute path to ensure export can find it
-                user_form_session.modified_file_path = os.path.abspath(latest_modified)
+                user_form_session.modified_file_path = latest_modified
             elif has_successful_tasks:
                 # Mark session as having modifications even if no file was created
                 # This enables the export button for task-based edits
                 user_form_session.modified_file_path = "task_based_edit"
-            db.commit()
+            await asyncio.to_thread(db.commit)
+            _invalidate_status_cache(current_user.id)
 
             # ================= Save form version to DB (full xml_content) =================
-            try:
-                from database_manager import get_form_manager
-                from database_schema import FormVersion, MasterForm
-
-                # Derive a stable form name from original filename (without extension)
-                form_name = os.path.basename(user_form_session.original_file_path).replace(".xml", "")
-
-                # Read modified XML content
-                modified_path = user_form_session.modified_file_path or working_file
-                xml_content = ""
-                try:
-                    with open(modified_path, "r", encoding="utf-8") as xf:
-                        xml_content = xf.read()
-                    print(f"📄 Read XML content: {len(xml_content)} characters from {modified_path}")
-                except Exception as e:
-                    print(f"❌ Failed to read XML content from {modified_path}: {str(e)}")
-                    pass
-
-                # Find or create master form
-                master_form = db.query(MasterForm).filter(MasterForm.name == form_name).first()
-                timestamp_version = datetime.utcnow().strftime("%Y%m%d_%H%M%S")  # Full timestamp: YYYYMMDD_HHMMSS
-
-                if not master_form:
-                    # Restore previous behavior: create master form record when missing
-                    form_manager = get_form_manager()
-                    created = form_manager.create_master_form(
-                        name=form_name,
-                        version=timestamp_version,
-                        xml_content=xml_content or "",
-                        description=f"Auto-created from edits for {form_name}",
-                        form_type="General",
-                        equipment_types=[],
-                        tags=[],
-                        created_by=current_user.id,
-                    )
-                    # Refresh from DB
-                    master_form = db.query(MasterForm).filter(MasterForm.name == form_name).first()
-                else:
-                    # For existing master form, add a new version as a draft (do not mark as current)
-                    new_version = FormVersion(
-                        master_form_id=master_form.id,
-                        version=f"{form_name}_{timestamp_version}",  # Descriptive version name
-                        xml_content=xml_content or "",
-                        xml_compressed=False,
-                        form_structure=None,
-                        field_names=None,
-                        choice_lists=None,
-                        file_path=modified_path,
-                        file_size=os.path.getsize(modified_path) if os.path.exists(modified_path) else None,
-                        file_checksum=None,
-                        created_by=current_user.id,
-                        change_summary=f"AI edit: {prompt[:50]}..." if len(prompt) > 50 else f"AI edit: {prompt}",
-                        is_current=False,
-                        is_published=False,
-                    )
-                    db.add(new_version)
-                    db.commit()
-                    print(f"✅ Saved version to DB: {new_version.version} with {len(xml_content)} characters")
-
-            except Exception as e:
-                print(f"❌ Failed to save version to DB: {str(e)}")
-                # Rollback the transaction and start fresh
-                db.rollback()
-                # Non-fatal: version save failed shouldn't break edit response
-                operation_logger = get_operation_logger()
-                operation_logger.log_operation(
-                    operation_type=OperationType.UPDATE,
-                    description=f"Version save failed for {form_name}",
-                    target_type="form_version",
-                    target_name=form_name,
-                    user_id=current_user.id,
-                    success=False,
-                    error_message=str(e),
-                )
+            # Done after the response is sent, on its own DB session
+            modified_path = user_form_session.modified_file_path or working_file
+            # The agent's XML is only valid for the exact file it reported writing
+            reuse_agent_xml = agent_xml is not None and reported_path and latest_modified == modified_path
+            background_tasks.add_task(
+                _save_form_version,
+                form_name=form_name,
+                modified_path=modified_path,
+                xml_content=agent_xml if reuse_agent_xml else None,
+                change_summary=change_summary,
+                user_id=current_user.id,
+                timestamp_version=now.strftime("%Y%m%d_%H%M%S"),  # Full timestamp: YYYYMMDD_HHMMSS
+            )
 
             # Log AI edit operation
             operation_logger = get_operation_logger()
             operation_logger.log_operation(
                 operation_type=OperationType.UPDATE,
-                description=f"AI edit applied: {prompt[:100]}",
+                description=f"AI edit applied: {prompt_preview}",
                 target_type="xml_file",
                 target_name=current_uploaded_file,
                 user_id=current_user.id,
@@ -1069,7 +1560,7 @@ async def ai_edit_endpoint(
             operation_logger = get_operation_logger()
             operation_logger.log_operation(
                 operation_type=OperationType.UPDATE,
-                description=f"AI edit failed: {prompt[:100]}",
+                description=f"AI edit failed: {prompt_preview}",
                 target_type="xml_file",
                 target_name=current_uploaded_file,
                 user_id=current_user.id,
@@ -1083,7 +1574,7 @@ async def ai_edit_endpoint(
         operation_logger = get_operation_logger()
         operation_logger.log_operation(
             operation_type=OperationType.UPDATE,
-            description=f"AI edit exception: {prompt[:100]}",
+            description=f"AI edit exception: {prompt_preview}",
             target_type="xml_file",
             target_name=current_uploaded_file,
             user_id=current_user.id,
@@ -1095,21 +1586,14 @@ async def ai_edit_endpoint(
 
 @app.get("/api/export/xml")
 async def export_xml(
-    current_user: User = Depends(get_current_active_user), db: Session = Depends(get_database_session)
+    current_user: SessionUser = Depends(get_current_active_user),
+    user_form_session: Optional[Row] = Depends(get_active_form_session_paths),
+    db: Session = Depends(get_database_session),
 ):
     """
     Download the modified XML file.
     Requires an edited file to exist; otherwise returns 400 instructing to run AI edit first.
     """
-    from database_schema import FormWorkStatus, UserFormSession
-
-    user_form_session = (
-        db.query(UserFormSession)
-        .filter(UserFormSession.user_id == current_user.id, UserFormSession.status == FormWorkStatus.ACTIVE.value)
-        .order_by(UserFormSession.created_at.desc())
-        .first()
-    )
-
     if not user_form_session or not user_form_session.original_file_path:
         raise HTTPException(status_code=400, detail="No form uploaded. Please upload an XML file first.")
 
@@ -1119,49 +1603,64 @@ async def export_xml(
 
     try:
         # First try to export from DB-stored form version content
-        from database_schema import FormVersion, MasterForm
-
-        original_name = os.path.basename(user_form_session.original_file_path).replace(".xml", "")
+        original_name = _form_stem(user_form_session.original_file_path)
         export_filename = f"{original_name}_modified.xml"  # Default filename
         file_type = "modified"
         xml_content: str = None
-
-        master = db.query(MasterForm).filter(MasterForm.name == original_name).first()
-        if master:
-            print(f"🔍 Found master form: {master.name} (ID: {master.id})")
-            # Prefer latest by created_at (drafts) created by the current user
-            version = (
-                db.query(FormVersion)
-                .filter(FormVersion.master_form_id == master.id)
-                .filter(FormVersion.created_by == current_user.id)
-                .order_by(FormVersion.created_at.desc())
-                .first()
+        xml_compressed = False
+
+        # Latest version (drafts included) of this form created by the current user; the XML
+        # blob is left out so it is only pulled from the DB when the file on disk can't be used
+        version = await asyncio.to_thread(
+            _execute_first,
+            db,
+            select(FormVersion.id, FormVersion.version, FormVersion.created_at, FormVersion.file_path, FormVersion.file_size)
+            .join(MasterForm, FormVersion.master_form_id == MasterForm.id)
+            .where(MasterForm.name == original_name, FormVersion.created_by == current_user.id)
+            .order_by(FormVersion.created_at.desc())
+            .limit(1),
+        )
+        if version:
+            # Create filename with original name + timestamp
+            export_filename = f"{original_name}_{version.version}.xml"
+            # Modified files are written once under a timestamped name, so a file of the recorded
+            # size is the version's content; FileResponse sends it without reading it into memory
+            if version.file_path and version.file_size is not None:
+                disk_size = await asyncio.to_thread(_file_size, version.file_path)
+                if disk_size == version.file_size:
+                    logger.debug("Exporting version %s from disk: %s", version.version, version.file_path)
+                    return FileResponse(
+                        version.file_path,
+                        media_type="application/xml",
+                        filename=export_filename,
+                        headers={
+                            "Content-Disposition": f"attachment; filename={export_filename}",
+                            "X-File-Type": file_type,
+                            "X-Has-Modifications": "true",
+                            "X-Exported-By": current_user.username,
+                        },
+                    )
+            stored = await asyncio.to_thread(
+                _execute_first,
+                db,
+                select(FormVersion.xml_content, FormVersion.xml_compressed).where(FormVersion.id == version.id),
             )
-            if version and version.xml_content:
-                print(f"✅ Exporting from DB: version {version.version} (created: {version.created_at})")
-                # Create filename with original name + timestamp
-                export_filename = f"{original_name}_{version.version}.xml"
-                xml_content = version.xml_content
-            else:
-                print(f"⚠️  No DB version found for user {current_user.id}")
-        else:
-            print(f"⚠️  No master form found for '{original_name}'")
-
+            if stored and stored.xml_content:
+                logger.debug("Exporting from DB: version %s (created: %s)", version.version, version.created_at)
+                xml_content = stored.xml_content
+                xml_compressed = stored.xml_compressed
         if xml_content is None:
+            logger.debug("No DB version of '%s' found for user %s", original_name, current_user.id)
             # Fallback to filesystem path resolution
-            print(f"🔄 Falling back to filesystem for export")
-            print(f"🔍 Modified file path: {user_form_session.modified_file_path}")
+            logger.debug("Falling back to filesystem for export of %s", user_form_session.modified_file_path)
             export_file_path = user_form_session.modified_file_path
             if export_file_path == "task_based_edit" or not os.path.isabs(export_file_path):
-                import glob
-
                 original_dir = os.path.dirname(os.path.abspath(user_form_session.original_file_path))
-                pattern = os.path.join(original_dir, f"modified_{original_name}_*.xml")
-                candidates = glob.glob(pattern)
-                if candidates:
-                    export_file_path = max(candidates, key=os.path.getctime)
-                    print(f"📁 Found filesystem file: {export_file_path}")
-            if not os.path.exists(export_file_path):
+                candidate = await asyncio.to_thread(_latest_modified_file, original_dir, f"modified_{original_name}_")
+                if candidate:
+                    export_file_path = candidate
+                    logger.debug("Found filesystem file: %s", export_file_path)
+            if not await asyncio.to_thread(os.path.exists, export_file_path):
                 raise HTTPException(status_code=404, detail="Edited XML file not found")
 
             filename = os.path.basename(user_form_session.original_file_path)
@@ -1180,42 +1679,16 @@ async def export_xml(
             )
 
         # Return DB content as file download
-        print(f"📄 Serving XML from DB: {len(xml_content)} characters, filename: {export_filename}")
-        from fastapi.responses import Response
-
-        return Response(
-            content=xml_content,
-            media_type="application/xml",
-            headers={
-                "Content-Disposition": f"attachment; filename={export_filename}",
-                "X-File-Type": file_type,
-                "X-Has-Modifications": "true",
-                "X-Exported-By": current_user.username,
-            },
-        )
-
-        # Log export operation
-        operation_logger = get_operation_logger()
-        operation_logger.log_operation(
-            operation_type=OperationType.READ,
-            description=f"File exported: {export_filename}",
-            target_type="file_export",
-            target_name=export_filename,
-            user_id=current_user.id,
-            success=True,
-            after_data={"file_type": file_type, "has_modifications": True},
-        )
-
-        return FileResponse(
-            export_file_path,
-            media_type="application/xml",
-            filename=export_filename,
-            headers={
-                "Content-Disposition": f"attachment; filename={export_filename}",
-                "X-File-Type": file_type,
-                "X-Has-Modifications": "true",
-                "X-Exported-By": current_user.username,
-            },
+        logger.debug("Serving XML from DB: %d stored characters, filename: %s", len(xml_content), export_filename)
+        headers = {
+            "Content-Disposition": f"attachment; filename={export_filename}",
+            "X-File-Type": file_type,
+            "X-Has-Modifications": "true",
+            "X-Exported-By": current_user.username,
+        }
+        # Decompress/encode chunk by chunk rather than materializing a second copy of the document
+        return StreamingResponse(
+            iter_stored_xml(xml_content, xml_compressed), media_type="application/xml", headers=headers
         )
 
     except HTTPException:
@@ -1234,24 +1707,20 @@ async def export_xml(
 
 
 @app.post("/api/sessions/reset")
-async def reset_active_session(
-    current_user: User = Depends(get_current_active_user), db: Session = Depends(get_database_session)
+def reset_active_session(
+    current_user: SessionUser = Depends(get_current_active_user), db: Session = Depends(get_database_session)
 ):
     """Mark any active user form session as completed so a fresh login does not see previous uploads."""
     try:
-        from database_schema import FormWorkStatus, UserFormSession
-
-        active = (
-            db.query(UserFormSession)
-            .filter(UserFormSession.user_id == current_user.id, UserFormSession.status == FormWorkStatus.ACTIVE.value)
-            .all()
+        # One UPDATE ... WHERE for all of the user's active sessions
+        result = db.execute(
+            update(UserFormSession)
+            .where(UserFormSession.user_id == current_user.id, UserFormSession.status == FormWorkStatus.ACTIVE.value)
+            .values(status=FormWorkStatus.COMPLETED.value)
         )
-        count = 0
-        for s in active:
-            s.status = FormWorkStatus.COMPLETED.value
-            db.add(s)
-            count += 1
+        count = result.rowcount
         db.commit()
+        _invalidate_status_cache(current_user.id)
         get_operation_logger().log_operation(
             operation_type=OperationType.UPDATE,
             description="Reset active user form sessions",
@@ -1265,23 +1734,20 @@ async def reset_active_session(
         raise HTTPException(status_code=500, detail=f"Failed to reset sessions: {str(e)}")
 
 
-@app.get("/api/status")
-async def get_status(
-    current_user: User = Depends(get_current_active_user), db: Session = Depends(get_database_session)
-):
-    """
-    Get current user session status (alias of /api/my-status)
-
-    Shows what file is loaded, if there are modifications, and recent edit history
-    """
-    from database_schema import FormWorkStatus, UserFormSession
-
-    ufs = (
-        db.query(UserFormSession)
-        .filter(UserFormSession.user_id == current_user.id, UserFormSession.status == FormWorkStatus.ACTIVE.value)
+def _load_status(db: Session, user_id: int) -> Dict[str, Any]:
+    """Build the /api/status body for a user, without its timestamp."""
+    # Project only the columns this endpoint renders; the full analysis_json blob is never needed here
+    ufs = db.execute(
+        select(
+            UserFormSession.original_file_path,
+            UserFormSession.modified_file_path,
+            UserFormSession.edit_history_json,
+            UserFormSession.analysis_json["worksheets"].label("worksheets"),
+        )
+        .where(UserFormSession.user_id == user_id, UserFormSession.status == FormWorkStatus.ACTIVE.value)
         .order_by(UserFormSession.created_at.desc())
-        .first()
-    )
+        .limit(1)
+    ).first()
     if not ufs:
         return {
             "has_file_uploaded": False,
@@ -1291,30 +1757,24 @@ async def get_status(
             "worksheets": [],
             "total_edits": 0,
             "edit_history": [],
-            "timestamp": datetime.now().isoformat(),
         }
-    analysis = ufs.analysis_json or {}
-    worksheets = list(analysis.get("worksheets", {}).keys()) if analysis else []
+    worksheets = list((ufs.worksheets or {}).keys())
     history = ufs.edit_history_json or []
 
     # Get a better display name for modified file
     modified_file_display = None
     if ufs.modified_file_path:
-        original_name = os.path.basename(ufs.original_file_path).replace(".xml", "")
+        original_name = _form_stem(ufs.original_file_path)
         # Check if there's a form version in DB for this user
-        from database_schema import FormVersion, MasterForm
-
-        master = db.query(MasterForm).filter(MasterForm.name == original_name).first()
-        if master:
-            version = (
-                db.query(FormVersion)
-                .filter(FormVersion.master_form_id == master.id)
-                .filter(FormVersion.created_by == current_user.id)
-                .order_by(FormVersion.created_at.desc())
-                .first()
-            )
-            if version:
-                modified_file_display = f"{original_name}_{version.version}.xml"
+        version_name = db.execute(
+            select(FormVersion.version)
+            .join(MasterForm, FormVersion.master_form_id == MasterForm.id)
+            .where(MasterForm.name == original_name, FormVersion.created_by == user_id)
+            .order_by(FormVersion.created_at.desc())
+            .limit(1)
+        ).scalar()
+        if version_name:
+            modified_file_display = f"{original_name}_{version_name}.xml"
 
         # Fallback to file path if no DB version
         if not modified_file_display:
@@ -1328,10 +1788,27 @@ async def get_status(
         "worksheets": worksheets,
         "total_edits": len(history),
         "edit_history": history[-5:],
-        "timestamp": datetime.now().isoformat(),
     }
 
 
+@app.get("/api/status")
+def get_status(
+    current_user: SessionUser = Depends(get_current_active_user), db: Session = Depends(get_database_session)
+):
+    """
+    Get current user session status (alias of /api/my-status)
+
+    Shows what file is loaded, if there are modifications, and recent edit history
+    """
+    with _status_cache_lock:
+        body = _status_cache.get(current_user.id)
+    if body is None:
+        body = _load_status(db, current_user.id)
+        with _status_cache_lock:
+            _status_cache[current_user.id] = body
+    return {**body, "timestamp": datetime.now().isoformat()}
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -10,6 +10,7 @@ from pathlib import Path
 from typing import List, Dict, Any
 import hashlib
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 
 # Add project root to path
 project_root = Path(__file__).parent
@@ -109,7 +110,10 @@ class DatabaseSeeder:
         
         created_count = 0
         for user_data in users_to_create:
-            user = self.user_manager.create_user(**user_data)
+            try:
+                user = self.user_manager.create_user(**user_data)
+            except IntegrityError:
+                user = None
             if user:
                 created_count += 1
                 logger.info(f"Created user: {user.username} ({user.role.value})")
@@ -7,9 +7,35 @@ import json
 import os
 import re
 import shutil
+import threading
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+
+def _file_cache_key(xml_file_path: str) -> Tuple[str, int, int]:
+    st = os.stat(xml_file_path)
+    return (os.path.abspath(xml_file_path), st.st_mtime_ns, st.st_size)
+
+
+# Serialized bytes of recently saved files, keyed by (abspath, mtime_ns, size), so callers
+# persisting a result (e.g. as a form version) can take them instead of re-reading the file
+# from disk; a file rewritten since is never served stale.
+XML_SAVED_CACHE_MAX_BYTES = int(os.getenv("XML_SAVED_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+_saved_xml: LRUCache = LRUCache(maxsize=XML_SAVED_CACHE_MAX_BYTES, getsizeof=lambda data: max(len(data), 1))
+_saved_xml_lock = threading.Lock()
+
+
+def take_saved_xml(xml_file_path: str) -> Optional[bytes]:
+    """Pop the bytes save_modified_xml wrote to xml_file_path, if the file is unchanged since."""
+    try:
+        key = _file_cache_key(xml_file_path)
+    except OSError:
+        return None
+    with _saved_xml_lock:
+        return _saved_xml.pop(key, None)
 
 
 class XLSFormXMLEditor:
@@ -49,11 +75,11 @@ class XLSFormXMLEditor:
 
     def get_headers(self, table: ET.Element) -> List[str]:
         """Get headers from the first row of a table"""
-        rows = table.findall(".//ss:Row", self.namespaces)
-        if not rows:
+        # find() stops at the first row instead of collecting every row in the sheet
+        header_row = table.find(".//ss:Row", self.namespaces)
+        if header_row is None:
             return []
 
-        header_row = rows[0]
         headers = []
         cells = header_row.findall(".//ss:Cell", self.namespaces)
 
@@ -68,21 +94,26 @@ class XLSFormXMLEditor:
         """Return all worksheet elements."""
         return self.root.findall(".//ss:Worksheet", self.namespaces)
 
-    def detect_choice_worksheets(self) -> List[str]:
+    def detect_choice_worksheets(self, headers_by_sheet: Optional[Dict[str, List[str]]] = None) -> List[str]:
         """Detect worksheets that look like choice lists by header patterns.
 
         Heuristics:
         - Must have a table with headers containing at least 'label' and 'name' (any case)
         - Optionally contains 'list name' or 'list_name' or similar
         Returns worksheet names ordered by strength of match (strongest first).
+        Pass `headers_by_sheet` (worksheet name -> headers) when the headers are already known
+        to skip walking the tree again.
         """
+        if headers_by_sheet is None:
+            headers_by_sheet = {}
+            for ws in self._iter_worksheets():
+                table = self.find_table_in_worksheet(ws)
+                if table is not None:
+                    ws_name = ws.get("{urn:schemas-microsoft-com:office:spreadsheet}Name") or ""
+                    headers_by_sheet[ws_name] = self.get_headers(table)
         candidates: List[tuple[int, str]] = []
-        for ws in self._iter_worksheets():
-            ws_name = ws.get("{urn:schemas-microsoft-com:office:spreadsheet}Name") or ""
-            table = self.find_table_in_worksheet(ws)
-            if table is None:
-                continue
-            headers = [h.lower().strip() for h in self.get_headers(table)]
+        for ws_name, raw_headers in headers_by_sheet.items():
+            headers = [h.lower().strip() for h in raw_headers]
             if not headers:
                 continue
             has_label = any("label" == h or h.startswith("label") for h in headers)
@@ -1074,8 +1105,12 @@ class XLSFormXMLEditor:
                 shutil.copy2(self.original_xml_path, backup_path)
                 print(f"✅ Backup created: {backup_path}")
 
-            # Write the modified XML
-            self.tree.write(output_path, encoding="utf-8", xml_declaration=True, method="xml")
+            # Write the modified XML, keeping the serialized bytes for take_saved_xml
+            data = ET.tostring(self.tree.getroot(), encoding="utf-8", xml_declaration=True, method="xml")
+            with open(output_path, "wb") as f:
+                f.write(data)
+            with _saved_xml_lock:
+                _saved_xml[_file_cache_key(output_path)] = data
 
             print(f"✅ Modified XML saved to: {os.path.abspath(output_path)}")
             return os.path.abspath(output_path)
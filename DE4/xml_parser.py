@@ -48,11 +48,11 @@ class XLSFormXMLEditor:
 
     def get_headers(self, table: ET.Element) -> List[str]:
         """Get headers from the first row of a table"""
-        rows = table.findall(".//ss:Row", self.namespaces)
-        if not rows:
+        # find() stops at the first row instead of collecting every row in the sheet
+        header_row = table.find(".//ss:Row", self.namespaces)
+        if header_row is None:
             return []
 
-        header_row = rows[0]
         headers = []
         cells = header_row.findall(".//ss:Cell", self.namespaces)
 
@@ -67,32 +67,24 @@ class XLSFormXMLEditor:
         """Return all worksheet elements."""
         return self.root.findall(".//ss:Worksheet", self.namespaces)
 
-    def detect_choice_worksheets(self) -> List[str]:
+    def detect_choice_worksheets(self, headers_by_sheet: Optional[Dict[str, List[str]]] = None) -> List[str]:
         """Detect worksheets that look like choice lists by header patterns.
 
         Heuristics:
         - Must have a table with headers containing at least 'label' and 'name' (any case)
         - Optionally contains 'list name' or 'list_name' or similar
         Returns worksheet names ordered by strength of match (strongest first).
+        Pass `headers_by_sheet` (worksheet name -> headers) when the headers are already known
+        to skip walking the tree again.
         """
-        candidates: List[tuple[int, str]] = []
-        for ws in self._iter_worksheets():
-            ws_name = ws.get("{urn:schemas-microsoft-com:office:spreadsheet}Name") or ""
-            table = self.find_table_in_worksheet(ws)
-            if table is None:
-                continue
-            headers = [h.lower().strip() for h in self.get_headers(table)]
-            if not headers:
-                continue
-            has_label = any("label" == h or h.startswith("label") for h in headers)
-            has_name = any(h == "name" or h.endswith(":name") or "name" == h for h in headers)
-            has_list = any(h.replace(" ", "_") in ("list_name", "listname") or h == "list name" for h in headers)
-            score = (2 if has_label else 0) + (2 if has_name else 0) + (1 if has_list else 0)
-            if score >= 3:  # needs at least label+name
-                candidates.append((score, ws_name))
-        # sort by score desc
-        candidates.sort(key=lambda x: x[0], reverse=True)
-        return [name for _, name in candidates]
+        if headers_by_sheet is None:
+            headers_by_sheet = {}
+            for ws in self._iter_worksheets():
+                table = self.find_table_in_worksheet(ws)
+                if table is not None:
+                    ws_name = ws.get("{urn:schemas-microsoft-com:office:spreadsheet}Name") or ""
+                    headers_by_sheet[ws_name] = self.get_headers(table)
+        return choice_worksheets_from_headers(headers_by_sheet)
 
     def find_rows_by_pattern(self, worksheet_name: str, column_index: int, pattern: str) -> List[ET.Element]:
         """Find rows where a specific column matches a pattern"""
@@ -1037,6 +1029,72 @@ def create_xml_editor(xml_file_path: str) -> XLSFormXMLEditor:
     return XLSFormXMLEditor(xml_file_path)
 
 
+def choice_worksheets_from_headers(headers_by_sheet: Dict[str, List[str]]) -> List[str]:
+    """Worksheet names whose headers look like a choice list, strongest match first.
+
+    Heuristics:
+    - Headers must contain at least 'label' and 'name' (any case)
+    - Optionally contains 'list name' or 'list_name' or similar
+    """
+    candidates: List[tuple[int, str]] = []
+    for ws_name, raw_headers in headers_by_sheet.items():
+        headers = [h.lower().strip() for h in raw_headers]
+        if not headers:
+            continue
+        has_label = any("label" == h or h.startswith("label") for h in headers)
+        has_name = any(h == "name" or h.endswith(":name") or "name" == h for h in headers)
+        has_list = any(h.replace(" ", "_") in ("list_name", "listname") or h == "list name" for h in headers)
+        score = (2 if has_label else 0) + (2 if has_name else 0) + (1 if has_list else 0)
+        if score >= 3:  # needs at least label+name
+            candidates.append((score, ws_name))
+    # sort by score desc
+    candidates.sort(key=lambda x: x[0], reverse=True)
+    return [name for _, name in candidates]
+
+
+_SS_NS = "{urn:schemas-microsoft-com:office:spreadsheet}"
+_SS_WORKSHEET = _SS_NS + "Worksheet"
+_SS_TABLE = _SS_NS + "Table"
+_SS_ROW = _SS_NS + "Row"
+_SS_CELL = _SS_NS + "Cell"
+_SS_DATA = _SS_NS + "Data"
+
+
+def scan_worksheet_headers(xml_file_path: str) -> Dict[str, Dict[str, Any]]:
+    """Stream the workbook and return {worksheet name: {"headers", "row_count"}}.
+
+    Only each table's first Row is turned into headers; every other Row is cleared as soon as it
+    has been read, so memory stays at roughly one row instead of the whole document tree.
+    Worksheets without a table get no headers and a row count of 0, as with the full editor.
+    """
+    worksheets: Dict[str, Dict[str, Any]] = {}
+    headers: Optional[List[str]] = None
+    table_info: Optional[Dict[str, Any]] = None
+    for _, elem in ET.iterparse(xml_file_path):
+        tag = elem.tag
+        if tag == _SS_ROW:
+            if headers is None:
+                headers = []
+                for cell in elem.iter(_SS_CELL):
+                    data_elem = cell.find(f".//{_SS_DATA}")
+                    headers.append(data_elem.text if data_elem is not None and data_elem.text else "")
+            elem.clear()
+        elif tag == _SS_TABLE:
+            if table_info is None:
+                try:
+                    row_count = int(elem.get(_SS_NS + "ExpandedRowCount", "0"))
+                except Exception:
+                    row_count = 0
+                table_info = {"headers": headers or [], "row_count": row_count}
+            elem.clear()
+        elif tag == _SS_WORKSHEET:
+            worksheets[elem.get(_SS_NS + "Name") or ""] = table_info or {"headers": [], "row_count": 0}
+            headers = None
+            table_info = None
+            elem.clear()
+    return worksheets
+
+
 # Compatibility shim for legacy imports
 class XLSFormParser:
     """
@@ -1055,6 +1113,7 @@ class XLSFormParser:
     def analyze_complete_form(self) -> Dict[str, Any]:
         """Return a dict with a `worksheets` map and detected choice sheets."""
         worksheets_info: Dict[str, Any] = {}
+        headers_by_sheet: Optional[Dict[str, List[str]]] = {}
         try:
             for ws in self._editor._iter_worksheets():  # type: ignore[attr-defined]
                 name_attr = ws.get("{urn:schemas-microsoft-com:office:spreadsheet}Name") or ""
@@ -1062,6 +1121,7 @@ class XLSFormParser:
                 headers = self._editor.get_headers(table) if table is not None else []
                 row_count = 0
                 if table is not None:
+                    headers_by_sheet[name_attr] = headers
                     try:
                         row_count = int(
                             table.get("{urn:schemas-microsoft-com:office:spreadsheet}ExpandedRowCount", "0")
@@ -1074,8 +1134,9 @@ class XLSFormParser:
                 }
         except Exception:
             worksheets_info = {}
+            headers_by_sheet = None
 
         return {
             "worksheets": worksheets_info,
-            "detected_choice_sheets": self._editor.detect_choice_worksheets(),
+            "detected_choice_sheets": self._editor.detect_choice_worksheets(headers_by_sheet),
         }
\ No newline at end of file